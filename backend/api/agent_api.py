@@ -1,21 +1,83 @@
+import json
+from typing import Optional
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from backend.services.testcase_service import generate_testcases
-from backend.services.selenium_service import generate_selenium_script
+from backend.services.testcase_service import generate_testcases_async, stream_testcases
+from backend.services.selenium_service import generate_selenium_script_async, generate_selenium_scripts
+from backend.services.script_validator import validate_scripts
+from backend.services.semantic_cache import get_semantic_cache
+from backend.core.llm_cache import get_llm_cache
+from backend.core.registry import registry
 
 router = APIRouter()
 
 class TestCaseRequest(BaseModel):
     query: str
+    use_cache: bool = True
 
 class ScriptRequest(BaseModel):
     testcase: dict
+    use_cache: bool = True
+    page: Optional[str] = None  # HTML file the script targets; defaults to checkout.html
+
+class BatchScriptRequest(BaseModel):
+    testcases: list[dict]
+    max_concurrency: Optional[int] = None
+    use_cache: bool = True
+    page: Optional[str] = None
+
+class ValidateScriptsRequest(BaseModel):
+    scripts: list[str]
+    page: Optional[str] = None  # HTML file the scripts target; defaults to checkout.html
 
 @router.post("/testcases")
-def testcase_generation(req: TestCaseRequest):
-    return generate_testcases(req.query)
+async def testcase_generation(req: TestCaseRequest):
+    return await generate_testcases_async(req.query, req.use_cache)
+
+@router.post("/testcases/stream")
+async def testcase_generation_stream(req: TestCaseRequest):
+    """Server-sent events: one `testcase` event per test case as soon as the model finishes it."""
+    async def events():
+        async for event, data in stream_testcases(req.query, req.use_cache):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/selenium-script")
-def create_script(req: ScriptRequest):
-    script = generate_selenium_script(req.testcase)
-    return {"script": script}
+async def create_script(req: ScriptRequest):
+    return await generate_selenium_script_async(req.testcase, req.use_cache, req.page)
+
+@router.post("/selenium-scripts/batch")
+async def create_scripts_batch(req: BatchScriptRequest):
+    """Stream one NDJSON line per test case as each script finishes."""
+    async def stream():
+        async for result in generate_selenium_scripts(req.testcases, req.max_concurrency, req.use_cache, req.page):
+            yield json.dumps(result) + "\n"
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/validate-scripts")
+def validate_scripts_batch(req: ValidateScriptsRequest):
+    """Check the locators of many generated scripts against the page's UI elements.
+
+    Returns one report per script, in order, listing missing and ambiguous
+    locators with their line numbers.
+    """
+    return validate_scripts(req.scripts, req.page)
+
+@router.get("/cache/stats")
+def cache_stats():
+    """Hit rates of the semantic test case cache and the LLM response cache, plus query embedding batching."""
+    semantic_cache = get_semantic_cache()
+    llm_cache = get_llm_cache()
+    # Don't load the embedding model just to report on it
+    embedding_model = registry.peek("embedding_model")
+    batcher = embedding_model.batcher if embedding_model is not None else None
+    return {
+        "semantic": semantic_cache.stats() if semantic_cache is not None else None,
+        "llm": llm_cache.stats() if llm_cache is not None else None,
+        "query_embedding_batches": batcher.stats() if batcher is not None else None
+    }
@@ -1,33 +1,113 @@
-import os
-from fastapi import APIRouter, UploadFile, File
-from backend.services.kb_service import ingest_document, ingest_html, get_kb_status, build_knowledge_base, reset_knowledge_base
+from typing import Optional
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import JSONResponse
+from backend.core.config import settings
+from backend.services.kb_service import get_kb_status, reset_knowledge_base, DOC_PATH, HTML_DIR
+from backend.api.upload_stream import MultipartUploadReceiver
+from backend.services.build_jobs import get_build_jobs
+from backend.services.ui_index import get_ui_index
+from backend.services.rag_service import retrieve_context
 
 router = APIRouter()
 
+async def _store_uploads(request: Request, dest_dir: str, max_mb: float, ingest: Optional[bool], kind: str):
+    """Stream the uploaded files into place and optionally queue a build for the new ones.
+
+    The multipart body is parsed as it arrives, so each file is written and
+    hashed once with the per-file limit checked on the way;
+    UploadSizeLimitMiddleware bounds the request as a whole.
+    """
+    receiver = MultipartUploadReceiver(dest_dir, int(max_mb * 1024 * 1024), settings.UPLOAD_MAX_FILES)
+    results = await receiver.receive(request)
+    if not results:
+        raise HTTPException(status_code=400, detail="No files in request")
+
+    saved = [r for r in results if "error" not in r]
+    if not saved:
+        raise HTTPException(status_code=413 if receiver.too_large else 400, detail=[r["error"] for r in results])
+
+    # Ingest-on-upload: the build skips unchanged files, so only the new ones get embedded
+    job = None
+    ingest = settings.UPLOAD_INGEST_DEFAULT if ingest is None else ingest
+    if ingest and any(not r["unchanged"] for r in saved):
+        job = get_build_jobs().request()
+
+    return {
+        "message": f"{len(saved)} {kind} uploaded",
+        "files": results,
+        "ingest_job": job.to_dict() if job is not None else None
+    }
+
 @router.post("/docs/upload")
-async def upload_doc(file: UploadFile = File(...)):
-    os.makedirs("backend/data/docs", exist_ok=True)
-    path = f"backend/data/docs/{file.filename}"
-    with open(path, "wb") as f:
-        f.write(await file.read())
-    return {"message": "Document uploaded"}
+async def upload_doc(request: Request, ingest: Optional[bool] = None):
+    """Upload documents as multipart file parts (e.g. `file` or `files`); `ingest=true` embeds them right away."""
+    return await _store_uploads(request, DOC_PATH, settings.UPLOAD_MAX_DOC_MB, ingest, "document(s)")
 
 @router.post("/html/upload")
-async def upload_html(file: UploadFile = File(...)):
-    os.makedirs("backend/data/html", exist_ok=True)
-    path = f"backend/data/html/{file.filename}"
-    with open(path, "wb") as f:
-        f.write(await file.read())
-    return {"message": "HTML uploaded"}
+async def upload_html(request: Request, ingest: Optional[bool] = None):
+    result = await _store_uploads(request, HTML_DIR, settings.UPLOAD_MAX_HTML_MB, ingest, "HTML file(s)")
+    get_ui_index().invalidate()
+    return result
+
+@router.get("/ui-elements")
+def ui_elements(page: Optional[str] = None, tag: Optional[str] = None, id: Optional[str] = None,
+                name: Optional[str] = None):
+    """Look up indexed UI elements of a page (default page when omitted) by tag, id and/or name."""
+    index = get_ui_index()
+    resolved = index.resolve_page(page)
+    if page is not None and resolved is None:
+        raise HTTPException(status_code=404, detail=f"Unknown page: {page}")
+    return {
+        "page": resolved,
+        "pages": index.pages(),
+        "elements": [e.dict() for e in index.find(resolved, tag=tag, html_id=id, name=name)] if resolved else []
+    }
 
 @router.get("/status")
 def kb_status():
     return get_kb_status()
 
-@router.get("/build")
+@router.get("/search")
+def kb_search(q: str, top_k: int = 8, mode: Optional[str] = None):
+    """Retrieve context for `q` and report which retrieval path answered it and where the time went."""
+    timings = []
+    try:
+        chunks = retrieve_context(q, top_k, mode=mode, timings=timings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "timing": timings[0], "chunks": [c.dict() for c in chunks]}
+
+@router.api_route("/build", methods=["GET", "POST"])
 def kb_build():
-    return build_knowledge_base()
+    """Start a background build and return its job; poll /kb/jobs/{job_id} for progress."""
+    job, started = get_build_jobs().start()
+    if job is None:
+        raise HTTPException(status_code=409, detail="A knowledge base reset is in progress")
+    if not started:
+        return JSONResponse(status_code=409, content={**job.to_dict(), "detail": "A build is already running"})
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+@router.get("/jobs")
+def kb_jobs():
+    return {"jobs": get_build_jobs().list()}
+
+@router.get("/jobs/{job_id}")
+def kb_job(job_id: str):
+    job = get_build_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown build job")
+    return job.to_dict()
+
+@router.post("/jobs/{job_id}/cancel")
+def kb_job_cancel(job_id: str):
+    job = get_build_jobs().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown build job")
+    return job.to_dict()
 
 @router.post("/reset")
 def kb_reset():
-    return reset_knowledge_base()
+    result = reset_knowledge_base()
+    if result.get("status") == "busy":
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
@@ -0,0 +1,70 @@
+import json
+from fastapi import HTTPException
+
+# Allowance for multipart boundaries, part headers and form fields on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+class UploadSizeLimitMiddleware:
+    """Rejects oversized upload requests before their body is received.
+
+    The upload endpoints check each file's limit while streaming it to
+    disk; this ASGI middleware also caps each upload path at `max_files`
+    times its per-file limit: a larger Content-Length is answered with 413
+    without reading the body, and a chunked body is cut off with 413 as
+    soon as it passes the cap.
+
+    `limits` maps request paths to their per-file limit in MB (0 disables).
+    """
+
+    def __init__(self, app, limits: dict, max_files: int):
+        self.app = app
+        self.max_bytes = {
+            path: int(mb * 1024 * 1024) * max(1, max_files) + MULTIPART_OVERHEAD_BYTES
+            for path, mb in limits.items() if mb > 0
+        }
+
+    async def _reject(self, send, limit: int):
+        body = json.dumps({"detail": f"Upload exceeds the {limit // (1024 * 1024)} MB request limit"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        limit = self.max_bytes.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised while the form is parsed; FastAPI turns it into the 413 response
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds the {limit // (1024 * 1024)} MB request limit")
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(send, limit)
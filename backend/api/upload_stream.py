@@ -0,0 +1,132 @@
+import asyncio
+from fastapi import HTTPException, Request
+from backend.services.kb_service import UploadWriter, UploadTooLarge
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    from python_multipart.exceptions import MultipartParseError
+except ImportError:  # python-multipart before 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+    from multipart.exceptions import MultipartParseError
+
+class MultipartUploadReceiver:
+    """Streams the file parts of a multipart/form-data request into UploadWriters.
+
+    The body is parsed as it arrives, so each file is written to the upload
+    temp directory and hashed in a single pass, without a spooled copy of
+    the request first. Files are moved into place only once the whole body
+    was received, so a failed or aborted request leaves nothing behind. A
+    file over the per-file limit, or with an invalid name, is reported and
+    the rest of its part discarded; the other files are still stored.
+    Parts without a file name (plain form fields) are ignored.
+    """
+
+    def __init__(self, dest_dir: str, max_bytes: int, max_files: int):
+        self.dest_dir = dest_dir
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.too_large = False
+        self._files = []  # UploadWriter, or an error dict, per file part in order
+        self._writer = None
+        self._events = []
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    # Parser callbacks run inside parser.write(); they only record events, applied off the event loop
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        self._events.append(("begin", filename.decode("utf-8", "replace") if filename else None))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        self._events.append(("data", data[start:end]))
+
+    def _on_part_end(self):
+        self._events.append(("end", None))
+
+    def _apply(self, events: list):
+        for kind, value in events:
+            if kind == "begin":
+                self._writer = None
+                if value is None:
+                    continue
+                if len(self._files) >= self.max_files:
+                    raise HTTPException(status_code=400, detail=f"At most {self.max_files} files per upload")
+                try:
+                    self._writer = UploadWriter(self.dest_dir, value, self.max_bytes)
+                    self._files.append(self._writer)
+                except ValueError as e:
+                    self._files.append({"filename": value, "error": str(e)})
+            elif self._writer is None:
+                continue
+            elif kind == "data":
+                try:
+                    self._writer.write(value)
+                except UploadTooLarge as e:
+                    self._writer.abort()
+                    self._files[-1] = {"filename": self._writer.filename, "error": str(e)}
+                    self._writer = None
+                    self.too_large = True
+            else:
+                self._writer.close()
+                self._writer = None
+
+    def _commit(self) -> list:
+        return [f.commit() if isinstance(f, UploadWriter) else f for f in self._files]
+
+    def _abort(self):
+        for f in self._files:
+            if isinstance(f, UploadWriter):
+                f.abort()
+
+    async def _flush_events(self):
+        if self._events:
+            events, self._events = self._events, []
+            await asyncio.to_thread(self._apply, events)
+
+    async def receive(self, request: Request) -> list:
+        """Store every file of the request; returns one result (or error) dict per file."""
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+        parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end
+        })
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                await self._flush_events()
+            parser.finalize()
+            await self._flush_events()
+            if self._writer is not None:
+                raise HTTPException(status_code=400, detail="Incomplete multipart body")
+            return await asyncio.to_thread(self._commit)
+        except MultipartParseError as e:
+            raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+        finally:
+            # Removes the partial files of a failed request; committed files are already in place
+            await asyncio.to_thread(self._abort)
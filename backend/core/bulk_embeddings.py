@@ -0,0 +1,75 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from backend.core.config import settings
+
+# Smallest shard sent to a worker process; below this IPC overhead dominates
+MIN_SHARD_SIZE = 16
+
+# The encoder loaded by each worker process
+_worker_encoder = None
+
+def _init_worker(model_name: str, backend: str, threads: int):
+    global _worker_encoder
+    from backend.core.embeddings import load_encoder
+    _worker_encoder = load_encoder(model_name, backend, threads)
+
+def _encode_shard(texts: list[str]) -> np.ndarray:
+    return np.asarray(_worker_encoder.encode(texts, show_progress_bar=False), dtype=np.float32)
+
+class BulkEmbedder:
+    """Embeds large batches on a pool of CPU worker processes, each holding its own model.
+
+    Batches are split into one shard per worker and the results concatenated
+    in order. Cache lookups and writes stay in this process (through
+    EmbeddingModel.encode), so only cache misses reach the workers. Each
+    worker is limited to its share of the cores so the processes don't
+    oversubscribe the CPU.
+    """
+
+    def __init__(self, embedding_model, workers: int = None):
+        self.embedding_model = embedding_model
+        self.workers = max(1, workers or settings.BULK_EMBED_WORKERS)
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        started = time.perf_counter()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(embedding_model.model_name, embedding_model.backend, threads)
+        )
+        # Load the model in every worker now instead of on the first batch
+        list(self._pool.map(_encode_shard, [["warmup"]] * self.workers))
+        print(f"✓ Started {self.workers} embedding processes ({threads} threads each) "
+              f"in {time.perf_counter() - started:.1f}s")
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.seconds = 0.0
+
+    def _compute(self, texts: list[str]) -> np.ndarray:
+        shard_size = max(MIN_SHARD_SIZE, -(-len(texts) // self.workers))
+        shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+        return np.concatenate(list(self._pool.map(_encode_shard, shards)))
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Same result as EmbeddingModel.encode, computed on the worker processes."""
+        started = time.perf_counter()
+        embeddings = self.embedding_model.encode(texts, compute=self._compute)
+        with self._lock:
+            self.chunks += len(texts)
+            self.seconds += time.perf_counter() - started
+        return embeddings
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "chunks": self.chunks,
+                "chunks_per_second": round(self.chunks / self.seconds, 1) if self.seconds else 0.0
+            }
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
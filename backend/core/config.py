@@ -9,11 +9,92 @@ load_dotenv(BASE_DIR / ".env")
 class Settings:
     # Groq LLM Configuration
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))  # Max in-flight LLM calls per batch
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))  # Pooled HTTP connections (async client)
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))  # Retries on 429/5xx/connection errors
+    LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+    LLM_MAX_BACKOFF_SECONDS = float(os.getenv("LLM_MAX_BACKOFF_SECONDS", "60"))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # Client-side TPM limit, 0 disables
+
+    # LLM Response Cache
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "backend/data/llm_cache.sqlite3")
+    LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))  # In-memory LRU tier
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))  # SQLite tier
+    LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))  # 0 disables expiry
+
+    # Semantic Cache for /agent/testcases
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # Min cosine similarity for a hit
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))
+    
+    # Prompt Token Budget (input tokens; sections share it by weight, unused share is redistributed)
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+    PROMPT_WEIGHT_CONTEXT = float(os.getenv("PROMPT_WEIGHT_CONTEXT", "4"))
+    PROMPT_WEIGHT_HTML = float(os.getenv("PROMPT_WEIGHT_HTML", "3"))
+    PROMPT_WEIGHT_UI_TABLE = float(os.getenv("PROMPT_WEIGHT_UI_TABLE", "2"))
+    PROMPT_WEIGHT_TESTCASE = float(os.getenv("PROMPT_WEIGHT_TESTCASE", "1"))
     
     # Pinecone Vector Store Configuration
     PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
     PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "qa-agent-index")
     PINECONE_CLOUD = os.getenv("PINECONE_CLOUD", "aws")  # Options: "aws", "gcp", "azure"
     PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east-1")  # Free tier region
+    PINECONE_QUERY_CONCURRENCY = int(os.getenv("PINECONE_QUERY_CONCURRENCY", "8"))  # Parallel searches per batch
+    PINECONE_STATS_REFRESH_SECONDS = float(os.getenv("PINECONE_STATS_REFRESH_SECONDS", "60"))  # 0 disables background reconcile
+
+    # Vector Store Backend
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")  # Options: "pinecone", "local"
+    LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "backend/data/vectors")
+
+    # Retrieval
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "auto")  # Options: "dense", "hybrid" (BM25 + vectors, fused), "auto" (BM25 alone for short exact-term queries, else hybrid)
+    LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"  # BM25 index built alongside the vectors
+    LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "backend/data/lexical_index.json")
+    LEXICAL_FAST_PATH_MAX_TERMS = int(os.getenv("LEXICAL_FAST_PATH_MAX_TERMS", "3"))  # Longest query (in terms) the lexical-only path answers
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # Results taken from each retriever before fusion
+    HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))  # Reciprocal rank fusion constant
+
+    # Embedding Model
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # Options: "torch" (sentence-transformers), "onnx" (onnxruntime, CPU)
+    EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "backend/data/onnx/all-MiniLM-L6-v2")  # Exported on first use if missing
+    EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "true").lower() == "true"  # Dynamic int8 weights
+    EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # onnxruntime intra-op threads, 0 = all cores
+
+    # Query embedding micro-batching (concurrent requests share one encode call)
+    EMBEDDING_MICRO_BATCHING = os.getenv("EMBEDDING_MICRO_BATCHING", "true").lower() == "true"
+    EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))  # Max wait for stragglers, only when other requests are in flight
+    EMBEDDING_BATCH_MAX_TEXTS = int(os.getenv("EMBEDDING_BATCH_MAX_TEXTS", "64"))
+
+    # Shared embedding server (python -m backend.core.embedding_server) for multi-worker deployments
+    EMBEDDING_SERVER_ADDRESS = os.getenv("EMBEDDING_SERVER_ADDRESS", "")  # "host:port" or "unix:/path"; empty loads the model in each process
+    EMBEDDING_SERVER_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_SERVER_TIMEOUT_SECONDS", "60"))
+    EMBEDDING_SERVER_FALLBACK = os.getenv("EMBEDDING_SERVER_FALLBACK", "true").lower() == "true"  # Load in-process if the server is down at startup
+
+    # Embedding Cache Configuration
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "backend/data/embedding_cache")
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))  # Max cached vectors
+    EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")  # Options: "float16", "float32"
+
+    # Document Parsing
+    PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))  # 1 disables the process pool
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))  # Smaller PDFs are extracted in-process
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # Chunks embedded and upserted per step
+    INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))  # Parser processes during a build
+    INGEST_UPSERT_WORKERS = int(os.getenv("INGEST_UPSERT_WORKERS", "4"))  # Concurrent vector store writers during a build
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))  # Batches buffered between pipeline stages
+    BULK_EMBED_WORKERS = int(os.getenv("BULK_EMBED_WORKERS", str(min(4, os.cpu_count() or 1))))  # Embedding processes for large builds, 1 disables
+    BULK_EMBED_MIN_CHUNKS = int(os.getenv("BULK_EMBED_MIN_CHUNKS", "2000"))  # Switch to the process pool once a build has this many chunks to embed
+
+    # Uploads
+    UPLOAD_MAX_DOC_MB = float(os.getenv("UPLOAD_MAX_DOC_MB", "100"))  # Per-file limit, 0 disables
+    UPLOAD_MAX_HTML_MB = float(os.getenv("UPLOAD_MAX_HTML_MB", "10"))
+    UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "20"))  # Files per upload request; with the per-file limits this caps the request body
+    UPLOAD_INGEST_DEFAULT = os.getenv("UPLOAD_INGEST_DEFAULT", "false").lower() == "true"  # Start a build after each upload
+
+    # Startup
+    STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"  # Load models and connect to Pinecone in the background at startup
 
 settings = Settings()
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class EmbeddingCache:
+    """Persistent, size-bounded cache of text embeddings.
+
+    Vectors live in a fixed-size memory-mapped array file with one row per
+    slot; a JSON index maps cache keys to slots in least-recently-used order.
+    When the cache is full the least recently used entry's slot is reused.
+    A second memory-mapped file records which key owns each slot and is
+    checked on every hit, so neither an index that was not flushed before a
+    crash nor another process sharing the directory (which may hand the same
+    free slot to a different key) can make it serve another key's vector.
+    """
+
+    def __init__(self, cache_dir: str, dimension: int, capacity: int, dtype: str = "float16",
+                 flush_interval: float = 30.0):
+        self.cache_dir = cache_dir
+        self.dimension = dimension
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.flush_interval = flush_interval
+        self.vectors_path = os.path.join(cache_dir, f"embeddings.{self.dtype.name}.mmap")
+        self.slot_keys_path = os.path.join(cache_dir, "slot_keys.mmap")
+        self.index_path = os.path.join(cache_dir, "index.json")
+
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()  # key -> slot, oldest first
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._open()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Cache key for a (model, text) pair; whitespace differences are ignored."""
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{model_name}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def _open(self):
+        index = self._read_index()
+        expected_size = self.capacity * self.dimension * self.dtype.itemsize
+        usable = (
+            index is not None
+            and index.get("dimension") == self.dimension
+            and index.get("capacity") == self.capacity
+            and index.get("dtype") == self.dtype.name
+            and os.path.exists(self.vectors_path)
+            and os.path.getsize(self.vectors_path) == expected_size
+            and os.path.exists(self.slot_keys_path)
+            and os.path.getsize(self.slot_keys_path) == self.capacity * 32
+        )
+
+        mode = "r+" if usable else "w+"
+        self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode=mode,
+                                  shape=(self.capacity, self.dimension))
+        self._slot_keys = np.memmap(self.slot_keys_path, dtype=np.uint8, mode=mode,
+                                    shape=(self.capacity, 32))
+        if usable:
+            self._slots = OrderedDict(
+                (key, slot) for key, slot in index["entries"]
+                if bytes(self._slot_keys[slot]) == bytes.fromhex(key)
+            )
+            print(f"✓ Loaded embedding cache with {len(self._slots)} entries")
+        else:
+            print(f"Created empty embedding cache at {self.cache_dir}")
+        self._free = sorted(set(range(self.capacity)) - set(self._slots.values()), reverse=True)
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: embedding cache index unreadable, rebuilding: {e}")
+            return None
+
+    def get_many(self, keys: list[str]) -> list:
+        """Return the cached vector (float32) for each key, or None on a miss."""
+        results = []
+        with self._lock:
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                owner = bytes.fromhex(key)
+                vector = None
+                if bytes(self._slot_keys[slot]) == owner:
+                    vector = np.array(self._vectors[slot], dtype=np.float32)
+                    # Re-check: a writer clears the owner before replacing the vector
+                    if bytes(self._slot_keys[slot]) != owner:
+                        vector = None
+                if vector is None:
+                    # Another process reused the slot; the entry is gone. The slot goes to the
+                    # back of the free list (popped from the end) so its new owner keeps it longest
+                    del self._slots[key]
+                    self._free.insert(0, slot)
+                    self._dirty = True
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self._slots.move_to_end(key)
+                self.hits += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, keys: list[str], vectors):
+        """Store vectors under the given keys, evicting least recently used entries if full."""
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                self._slots[key] = slot
+                self._slots.move_to_end(key)
+                # Clear the owner first so readers never pair it with a half-written vector
+                self._slot_keys[slot] = 0
+                self._vectors[slot] = np.asarray(vector, dtype=self.dtype)
+                self._slot_keys[slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+            self._dirty = True
+            flush_due = time.monotonic() - self._last_flush >= self.flush_interval
+        if flush_due:
+            self.flush()
+
+    def flush(self):
+        """Persist the vector file and index to disk."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._vectors.flush()
+            self._slot_keys.flush()
+            index = {
+                "dimension": self.dimension,
+                "capacity": self.capacity,
+                "dtype": self.dtype.name,
+                "entries": list(self._slots.items())
+            }
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+            self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._slots)
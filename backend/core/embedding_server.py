@@ -0,0 +1,210 @@
+"""Local embedding server shared by all API workers.
+
+With several uvicorn workers each process would otherwise load its own
+copy of the embedding model. Run one server instead:
+
+    python -m backend.core.embedding_server
+
+and set EMBEDDING_SERVER_ADDRESS (e.g. "127.0.0.1:8765" or
+"unix:/tmp/qa-agent-embed.sock") for the workers; get_embedding_model()
+then returns a RemoteEmbeddingModel talking to it. The server owns the
+model and its embedding cache, and its micro-batcher merges concurrent
+query requests from all workers into shared encode calls. Ingestion
+batches are encoded directly, so a large build batch never queues in
+front of interactive queries.
+
+Wire format: every message is a 4-byte big-endian length followed by the
+payload. Requests are JSON ({"op": "encode", "texts": [...]} for
+documents, {"op": "encode_queries", "texts": [...]}, {"op": "info"} or
+{"op": "flush"}); replies are a JSON header, and for the encode ops a
+second message with the float32 matrix in row-major order.
+"""
+import os
+import json
+import socket
+import struct
+import threading
+import socketserver
+import sys
+import numpy as np
+from backend.core.config import settings
+
+_LENGTH = struct.Struct(">I")
+
+def parse_address(address: str):
+    """(socket family, address) for "host:port" or "unix:/path"."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+def _send(sock: socket.socket, payload: bytes):
+    if len(payload) < 65536:
+        sock.sendall(_LENGTH.pack(len(payload)) + payload)  # Small messages in one segment
+    else:
+        sock.sendall(_LENGTH.pack(len(payload)))
+        sock.sendall(payload)
+
+def _recv_exact(sock: socket.socket, size: int) -> bytearray:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            raise ConnectionError("Embedding server connection closed")
+        received += count
+    return buffer
+
+def _recv(sock: socket.socket) -> bytearray:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, size)
+
+def _peak_rss_mb():
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+class RemoteEmbeddingModel:
+    """EmbeddingModel stand-in that embeds through the shared embedding server.
+
+    Each thread keeps its own persistent connection; a broken connection is
+    re-opened once before the error is raised.
+    """
+
+    def __init__(self, address: str = None, timeout: float = None):
+        self.address = address or settings.EMBEDDING_SERVER_ADDRESS
+        self.timeout = timeout or settings.EMBEDDING_SERVER_TIMEOUT_SECONDS
+        self.batcher = None  # Batching happens in the server
+        self._local = threading.local()
+        info = self.info()
+        self.model_name = info["model"]
+        self.dimension = info["dimension"]
+        print(f"✓ Using embedding server at {self.address} ('{self.model_name}', {info['backend']})")
+
+    def _connect(self) -> socket.socket:
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(address)
+        if family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _call(self, request: dict, with_matrix: bool = False):
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                _send(sock, json.dumps(request).encode("utf-8"))
+                header = json.loads(_recv(sock))
+                if not header.get("ok"):
+                    raise RuntimeError(f"Embedding server error: {header.get('error')}")
+                if not with_matrix:
+                    return header
+                matrix = np.frombuffer(_recv(sock), dtype=np.float32)
+                return matrix.reshape(header["rows"], header["dimension"])
+            except (OSError, ConnectionError):
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                if attempt == 1:
+                    raise
+
+    def info(self) -> dict:
+        return self._call({"op": "info"})
+
+    def _encode(self, op: str, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return self._call({"op": op, "texts": texts}, with_matrix=True)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Embed texts (e.g. chunks being ingested) as a float32 (len(texts), dimension) array."""
+        return self._encode("encode", texts)
+
+    def encode_queries(self, texts: list[str]) -> np.ndarray:
+        """Embed query texts through the server's micro-batcher."""
+        return self._encode("encode_queries", texts)
+
+    def flush(self):
+        """Ask the server to persist its embedding cache."""
+        self._call({"op": "flush"})
+
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        if self.request.family == socket.AF_INET:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        model = self.server.model
+        while True:
+            try:
+                request = json.loads(_recv(self.request))
+            except (ConnectionError, OSError):
+                return
+            try:
+                op = request.get("op")
+                if op in ("encode", "encode_queries"):
+                    # Only queries go through the micro-batcher; ingestion batches are encoded directly
+                    encode = model.encode_queries if op == "encode_queries" else model.encode
+                    embeddings = np.ascontiguousarray(encode(request["texts"]), dtype=np.float32)
+                    header = {"ok": True, "rows": embeddings.shape[0], "dimension": embeddings.shape[1]}
+                    _send(self.request, json.dumps(header).encode("utf-8"))
+                    _send(self.request, embeddings.tobytes())
+                    continue
+                if op == "info":
+                    reply = {
+                        "ok": True,
+                        "model": model.model_name,
+                        "backend": model.backend,
+                        "dimension": model.dimension,
+                        "peak_rss_mb": _peak_rss_mb(),
+                        "batches": model.batcher.stats() if model.batcher is not None else None
+                    }
+                elif op == "flush":
+                    model.flush()
+                    reply = {"ok": True}
+                else:
+                    reply = {"ok": False, "error": f"unknown op {op!r}"}
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            _send(self.request, json.dumps(reply).encode("utf-8"))
+
+def create_server(address: str, model=None):
+    """Bind the embedding server to `address` (not started); loads the local model if none is given."""
+    from backend.core.embeddings import EmbeddingModel
+
+    family, bind_address = parse_address(address)
+    if family == socket.AF_INET:
+        base = socketserver.ThreadingTCPServer
+    else:
+        if os.path.exists(bind_address):
+            os.remove(bind_address)  # Stale socket from a previous run
+        base = socketserver.ThreadingUnixStreamServer
+    # Every API worker thread keeps a connection open; a deep backlog absorbs the startup burst
+    server_class = type("EmbeddingServer", (base,), {
+        "daemon_threads": True, "allow_reuse_address": True, "request_queue_size": 256
+    })
+    server = server_class(bind_address, _Handler)
+    server.model = model or EmbeddingModel()
+    return server
+
+def main():
+    address = settings.EMBEDDING_SERVER_ADDRESS or "127.0.0.1:8765"
+    server = create_server(address)
+    print(f"✓ Embedding server listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.model.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import time
+import queue
+import threading
+import numpy as np
+from backend.core.config import settings
+from backend.core.embedding_cache import EmbeddingCache
+from backend.core.registry import registry
+
+class _BatchRequest:
+    def __init__(self, texts: list[str]):
+        self.texts = texts
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embeddings into shared encode calls.
+
+    One worker thread runs `encode`. Requests that arrive while it is busy
+    queue up and go out together in the next call. A lone request is encoded
+    right away; the worker only waits (up to `max_wait` seconds) for
+    stragglers when other callers are already mid-request, so batching never
+    delays an idle server.
+    """
+
+    def __init__(self, encode, max_wait: float, max_batch: int):
+        self._encode = encode
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._callers = 0  # Requests submitted and not yet answered
+        self._thread = None
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        request = _BatchRequest(texts)
+        with self._lock:
+            self._callers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self) -> list[_BatchRequest]:
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    others_waiting = self._callers > len(batch)
+                remaining = deadline - time.monotonic()
+                if not others_waiting or remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [t for request in batch for t in request.texts]
+            try:
+                embeddings = self._encode(texts)
+                start = 0
+                for request in batch:
+                    request.result = embeddings[start:start + len(request.texts)]
+                    start += len(request.texts)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            with self._lock:
+                self._callers -= len(batch)
+                self.requests += len(batch)
+                self.batches += 1
+                self.texts += len(texts)
+            for request in batch:
+                request.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "texts": self.texts,
+                "requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0
+            }
+
+def load_encoder(model_name: str, backend: str, threads: int = 0):
+    """The raw encoder (anything with SentenceTransformer's encode) for `backend`.
+
+    `threads` caps the CPU threads it may use (0 keeps the library default).
+    """
+    if backend == "onnx":
+        from backend.core.onnx_embeddings import OnnxEncoder
+        return OnnxEncoder(
+            model_name,
+            settings.EMBEDDING_ONNX_DIR,
+            quantize=settings.EMBEDDING_ONNX_QUANTIZE,
+            threads=threads or settings.EMBEDDING_ONNX_THREADS
+        )
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    return SentenceTransformer(model_name)
+
+class EmbeddingModel:
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", backend: str = None):
+        """Load the model on the configured backend and the persistent embedding cache."""
+        self.backend = backend or settings.EMBEDDING_BACKEND
+        print(f"Loading embedding model '{model_name}' ({self.backend})...")
+        self.model_name = model_name
+        self.model = load_encoder(model_name, self.backend)
+        # ONNX vectors differ slightly from the PyTorch ones, so they're cached separately
+        self.cache_name = model_name
+        if self.backend == "onnx":
+            self.cache_name = f"{model_name}:onnx" + ("-int8" if settings.EMBEDDING_ONNX_QUANTIZE else "")
+        self.dimension = 384  # Dimension for all-MiniLM-L6-v2
+        print("✓ Embedding model loaded")
+
+        self.cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            self.cache = EmbeddingCache(
+                settings.EMBEDDING_CACHE_DIR,
+                dimension=self.dimension,
+                capacity=settings.EMBEDDING_CACHE_SIZE,
+                dtype=settings.EMBEDDING_CACHE_DTYPE
+            )
+
+        self.batcher = None
+        if settings.EMBEDDING_MICRO_BATCHING:
+            self.batcher = EmbeddingBatcher(
+                self.encode,
+                max_wait=settings.EMBEDDING_BATCH_WAIT_MS / 1000,
+                max_batch=settings.EMBEDDING_BATCH_MAX_TEXTS
+            )
+
+    def _compute(self, texts: list[str]) -> np.ndarray:
+        return self.model.encode(texts, show_progress_bar=False)
+
+    def encode(self, texts: list[str], compute=None) -> np.ndarray:
+        """Embed texts as a float32 (len(texts), dimension) array, encoding only cache misses.
+
+        `compute` replaces the in-process model for the misses (see BulkEmbedder).
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        compute = compute or self._compute
+
+        if self.cache is None:
+            return np.asarray(compute(texts), dtype=np.float32)
+
+        keys = [EmbeddingCache.make_key(self.cache_name, t) for t in texts]
+        embeddings = self.cache.get_many(keys)
+
+        # Encode each distinct missing text once
+        missing = {}
+        for i, (key, embedding) in enumerate(zip(keys, embeddings)):
+            if embedding is None:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            missing_keys = list(missing)
+            encoded = compute([texts[missing[key][0]] for key in missing_keys])
+            self.cache.put_many(missing_keys, encoded)
+            for key, embedding in zip(missing_keys, encoded):
+                for i in missing[key]:
+                    embeddings[i] = embedding
+
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def encode_queries(self, texts: list[str]) -> np.ndarray:
+        """Like encode, for request-time queries: concurrent callers share encode calls."""
+        if self.batcher is None or not texts:
+            return self.encode(texts)
+        return self.batcher.encode(texts)
+
+    def flush(self):
+        """Persist the embedding cache to disk."""
+        if self.cache is not None:
+            self.cache.flush()
+
+def _create_embedding_model():
+    if settings.EMBEDDING_SERVER_ADDRESS:
+        from backend.core.embedding_server import RemoteEmbeddingModel
+        try:
+            return RemoteEmbeddingModel(settings.EMBEDDING_SERVER_ADDRESS)
+        except OSError as e:
+            if not settings.EMBEDDING_SERVER_FALLBACK:
+                raise
+            print(f"⚠️ Embedding server at {settings.EMBEDDING_SERVER_ADDRESS} unreachable ({e}), loading the model in-process")
+    return EmbeddingModel()
+
+def get_embedding_model() -> EmbeddingModel:
+    """Get or create the shared embedding model (a client of the embedding server when one is configured)."""
+    return registry.get("embedding_model", _create_embedding_model)
@@ -0,0 +1,141 @@
+import json
+
+class JSONArrayStreamParser:
+    """Incrementally extracts the objects of a JSON array from streamed text.
+
+    The array is either the top-level value or the value of a key of a
+    top-level object (e.g. {"testcases": [...]}); text around it (markdown
+    fences, prose) is skipped. A '[' not followed by an object, as in "the
+    [5] cases", is not treated as the array. Each object of the array is
+    returned by `feed` as soon as its closing brace arrives.
+
+    When `accept` is given, objects it rejects are dropped; if the first
+    object is rejected (e.g. the "steps" of a single test case object), the
+    parser gives up and emits nothing, so the caller can parse the full
+    reply instead.
+    """
+
+    def __init__(self, accept=None):
+        self.accept = accept
+        self.started = False
+        self.finished = False
+        self.emitted = 0
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # Scanning outside the array: "prelude", "object" (a top-level object) or "open" (just saw a '[')
+        self._mode = "prelude"
+        self._open_from = None
+        self._object_depth = 0
+        self._expect_value = False
+
+    def _scan_object(self, ch: str):
+        """Track a top-level object until a key's value opens with '['."""
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+            return
+        if ch.isspace():
+            return
+        expect_value, self._expect_value = self._expect_value, False
+        if ch == '"':
+            self._in_string = True
+        elif ch == ":" and self._object_depth == 1:
+            self._expect_value = True
+        elif ch == "[" and expect_value and self._object_depth == 1:
+            self._mode, self._open_from = "open", "object"
+        elif ch in "{[":
+            self._object_depth += 1
+        elif ch in "}]":
+            self._object_depth -= 1
+            if self._object_depth == 0:
+                self._mode = "prelude"  # A single object with no array of objects in it
+
+    def _scan_outside(self, ch: str):
+        if self._mode == "open":
+            if ch.isspace():
+                return
+            if ch == "{":
+                self.started = True
+                self._depth = 1
+                self._buffer = [ch]
+                return
+            if ch == "]":
+                self.finished = True  # Empty array
+                return
+            # Not an array of objects: go back to where the '[' was seen
+            if self._open_from == "object":
+                self._mode = "object"
+                self._object_depth += 1
+                self._scan_object(ch)
+            else:
+                self._mode = "prelude"
+                self._scan_outside(ch)
+            return
+        if self._mode == "object":
+            self._scan_object(ch)
+        elif ch == "[":
+            self._mode, self._open_from = "open", "prelude"
+        elif ch == "{":
+            self._mode = "object"
+            self._object_depth = 1
+            self._expect_value = False
+
+    def _complete(self, text: str, completed: list):
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            print(f"Skipping malformed streamed object: {e}")
+            return
+        if self.accept is not None and not self.accept(item):
+            if self.emitted == 0:
+                print("Streamed array does not hold the expected objects; waiting for the full reply")
+                self.finished = True
+            return
+        self.emitted += 1
+        completed.append(item)
+
+    def feed(self, text: str) -> list:
+        """Consume the next piece of text and return the objects it completed."""
+        completed = []
+        for ch in text:
+            if self.finished:
+                break
+            if not self.started:
+                self._scan_outside(ch)
+                continue
+
+            if self._depth == 0:
+                # Between array elements: only an object start or the array end matter
+                if ch == "{":
+                    self._depth = 1
+                    self._buffer = [ch]
+                elif ch == "]":
+                    self.finished = True
+                continue
+
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete("".join(self._buffer), completed)
+                    self._buffer = []
+        return completed
@@ -0,0 +1,267 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+from backend.core.models import Chunk
+from backend.core.config import settings
+from backend.core.registry import registry
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "with"
+}
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def _fold_plural(term: str) -> str:
+    """Light plural folding so "codes" matches "code" ("categories" -> "category"); no full stemming."""
+    if len(term) <= 3 or not term.endswith("s") or term.endswith(("ss", "us", "is")) or term[-2].isdigit():
+        return term
+    return term[:-3] + "y" if term.endswith("ies") else term[:-1]
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase alphanumeric terms without stop words; "SAVE15" -> ["save15"], "Codes" -> ["code"]."""
+    return [_fold_plural(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+class LexicalIndex:
+    """In-process BM25 inverted index over the same chunks as the vector store.
+
+    Answers exact-term queries (field names, promo codes, error messages)
+    without the embedding model or a network call. Chunk texts and metadata
+    are persisted as JSON; the postings are rebuilt from them on load.
+
+    Other processes (API workers) pick up a build's or reset's result: when
+    the file's mtime or size changes, the index is reloaded before the next
+    read or write, unless it holds unflushed changes of its own. Builds are
+    not merged across processes, so only one process should write at a time
+    (the last flush wins).
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.LEXICAL_INDEX_PATH
+        self._lock = threading.RLock()
+        self._records = {}  # chunk id -> (doc id, text, metadata, length in terms)
+        self._postings = {}  # term -> {chunk id: term frequency}
+        self._doc_chunks = Counter()  # doc id -> indexed chunks
+        self._total_length = 0
+        self._dirty = False
+        self._signature = None  # (mtime_ns, size) of the file last loaded or saved
+        self._load()
+        print(f"✓ Lexical index ready with {len(self._records)} chunks ({self.path})")
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _clear(self):
+        self._records = {}
+        self._postings = {}
+        self._doc_chunks = Counter()
+        self._total_length = 0
+
+    def _load(self):
+        self._signature = self._file_signature()
+        if self._signature is None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not load lexical index, starting empty: {e}")
+            return
+        for chunk_id, doc_id, text, metadata in zip(
+            records["ids"], records["doc_ids"], records["documents"], records["metadatas"]
+        ):
+            self._add(chunk_id, doc_id, text, metadata)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        ids = list(self._records)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": ids,
+                "doc_ids": [self._records[i][0] for i in ids],
+                "documents": [self._records[i][1] for i in ids],
+                "metadatas": [self._records[i][2] for i in ids]
+            }, f)
+        os.replace(tmp_path, self.path)
+        self._signature = self._file_signature()
+
+    def _refresh(self):
+        """Reload if another process replaced or removed the file (call with the lock held)."""
+        if self._dirty or self._file_signature() == self._signature:
+            return
+        self._clear()
+        self._load()
+        print(f"✓ Lexical index reloaded with {len(self._records)} chunks")
+
+    def _add(self, chunk_id: str, doc_id: str, text: str, metadata: dict):
+        if chunk_id in self._records:
+            self._remove(chunk_id)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[chunk_id] = tf
+        length = sum(terms.values())
+        self._records[chunk_id] = (doc_id, text, metadata, length)
+        self._doc_chunks[doc_id] += 1
+        self._total_length += length
+
+    def _remove(self, chunk_id: str):
+        doc_id, text, _, length = self._records.pop(chunk_id)
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._doc_chunks[doc_id] -= 1
+        if self._doc_chunks[doc_id] <= 0:
+            del self._doc_chunks[doc_id]
+        self._total_length -= length
+
+    def add_chunks(self, chunks: list[Chunk]):
+        """Index chunks, replacing any previous version with the same id."""
+        with self._lock:
+            self._refresh()
+            for chunk in chunks:
+                self._add(chunk.id, chunk.doc_id, chunk.text, chunk.metadata.copy())
+            self._dirty = self._dirty or bool(chunks)
+
+    def delete(self, ids: list[str]):
+        with self._lock:
+            self._refresh()
+            for chunk_id in ids:
+                if chunk_id in self._records:
+                    self._remove(chunk_id)
+                    self._dirty = True
+
+    def search(self, query: str, top_k: int = 5) -> list[dict]:
+        """Top chunks by BM25 score.
+
+        Each hit is a dict with the chunk's "id", "doc_id", "text" and
+        "metadata", its "score" and "coverage", the share of the query's
+        terms the chunk contains.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            self._refresh()
+            n = len(self._records)
+            if n == 0:
+                return []
+            average_length = self._total_length / n
+            scores, matched = {}, Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._records[chunk_id][3] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    matched[chunk_id] += 1
+
+            hits = []
+            for chunk_id, score in heapq.nlargest(top_k, scores.items(), key=lambda item: item[1]):
+                doc_id, text, metadata, _ = self._records[chunk_id]
+                hits.append({
+                    "id": chunk_id,
+                    "doc_id": doc_id,
+                    "text": text,
+                    "metadata": dict(metadata),
+                    "score": score,
+                    "coverage": matched[chunk_id] / len(terms)
+                })
+            return hits
+
+    def has_document(self, doc_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return doc_id in self._doc_chunks
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._records)
+
+    def reset(self):
+        """Remove every chunk and the persisted index."""
+        with self._lock:
+            self._clear()
+            self._dirty = False
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._signature = None
+        print("✓ Lexical index cleared")
+
+    def flush(self):
+        """Persist pending changes."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+class LexicallyIndexedStore:
+    """Vector store wrapper that mirrors every write into the lexical index.
+
+    Builds, single-document ingestion, deletes and resets keep both indexes
+    on the same chunks without each call site knowing about the second one;
+    queries go to the vector store unchanged.
+    """
+
+    def __init__(self, vector_store, lexical_index: LexicalIndex):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+
+    def add_chunks(self, chunks: list[Chunk], embeddings=None):
+        self.vector_store.add_chunks(chunks, embeddings)
+        self.lexical_index.add_chunks(chunks)
+
+    def query(self, query: str, top_k: int = 5):
+        return self.vector_store.query(query, top_k)
+
+    def query_batch(self, queries: list[str], top_k: int = 5, embeddings=None):
+        return self.vector_store.query_batch(queries, top_k, embeddings=embeddings)
+
+    def reset(self):
+        self.vector_store.reset()
+        self.lexical_index.reset()
+
+    def count(self) -> int:
+        return self.vector_store.count()
+
+    def count_known(self) -> bool:
+        return self.vector_store.count_known()
+
+    def delete(self, ids: list[str]):
+        self.vector_store.delete(ids)
+        self.lexical_index.delete(ids)
+
+    def flush(self):
+        self.vector_store.flush()
+        self.lexical_index.flush()
+
+    def close(self):
+        self.vector_store.close()
+        self.lexical_index.flush()
+
+def get_lexical_index() -> LexicalIndex:
+    """Get the shared lexical index."""
+    return registry.get("lexical_index", LexicalIndex)
+
+def with_lexical_index(vector_store):
+    """Wrap `vector_store` so writes also reach the lexical index (unless it is disabled)."""
+    if not settings.LEXICAL_INDEX_ENABLED:
+        return vector_store
+    return LexicallyIndexedStore(vector_store, get_lexical_index())
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from backend.core.config import settings
+from backend.core.registry import registry
+
+class LLMResponseCache:
+    """Two-tier cache of LLM completions keyed by a request fingerprint.
+
+    A small in-memory LRU sits in front of a SQLite table. Entries expire
+    after `ttl_seconds`; when the table grows past `max_entries` the least
+    recently used rows are evicted.
+    """
+
+    def __init__(self, db_path: str, memory_entries: int, max_entries: int, ttl_seconds: float):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (response, created_at), oldest first
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict], temperature: float, max_tokens: int) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, response: str, created_at: float):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Return the cached response for `key`, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, row[0], row[1])
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            if self.ttl_seconds > 0:
+                self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            (count,) = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._db.commit()
+
+    def clear(self):
+        """Drop every cached response (e.g. after the knowledge base changed)."""
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM llm_cache")
+            self._db.commit()
+        print("✓ LLM response cache cleared")
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            return {
+                "entries": count,
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses
+            }
+
+def get_llm_cache():
+    """Get the shared LLM response cache, or None when LLM_CACHE_ENABLED is false."""
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return registry.get("llm_cache", lambda: LLMResponseCache(
+        settings.LLM_CACHE_PATH,
+        memory_entries=settings.LLM_CACHE_MEMORY_ENTRIES,
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+    ))
+
+def invalidate_llm_cache():
+    """Clear cached completions; called whenever the knowledge base changes."""
+    cache = get_llm_cache()
+    if cache is not None:
+        cache.clear()
@@ -1,25 +1,287 @@
-from openai import OpenAI
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+import httpx
+from openai import OpenAI, AsyncOpenAI, APIStatusError, APIConnectionError, APITimeoutError
 from backend.core.config import settings
+from backend.core.llm_cache import LLMResponseCache, get_llm_cache
+from backend.core.registry import registry
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+SYSTEM_PROMPT = "You are a helpful QA test designer assistant."
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+def build_messages(prompt: str) -> list[dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough token cost of a request: ~4 characters per prompt token plus the completion budget."""
+    return len(prompt) // 4 + max_tokens
+
+def retry_delay(error: Exception, attempt: int):
+    """Seconds to wait before retrying `error`, or None if it should not be retried.
+
+    Honors the server's Retry-After header when present, otherwise uses
+    exponential backoff with jitter.
+    """
+    if isinstance(error, APIStatusError):
+        if error.status_code not in RETRYABLE_STATUS_CODES:
+            return None
+        retry_after = error.response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.LLM_MAX_BACKOFF_SECONDS)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(max(wait, 0.0), settings.LLM_MAX_BACKOFF_SECONDS)
+                except (TypeError, ValueError):
+                    pass
+    elif not isinstance(error, (APIConnectionError, APITimeoutError)):
+        return None
+
+    backoff = settings.LLM_BACKOFF_BASE_SECONDS * (2 ** attempt)
+    return min(backoff, settings.LLM_MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+
+class TokenRateLimiter:
+    """Token bucket that keeps requests under a tokens-per-minute budget.
+
+    Callers reserve their estimated cost up front; when the bucket is in debt
+    they are told how long to wait. Actual usage reported by the API is
+    credited back so over-estimates do not throttle later requests.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve `tokens` and return the number of seconds to wait before sending."""
+        with self._lock:
+            self._refill()
+            self.tokens -= min(tokens, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, tokens: int):
+        """Credit back (positive) or charge (negative) the difference from an estimate."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def acquire(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def get_rate_limiter():
+    """Get the process-wide limiter, or None when LLM_TOKENS_PER_MINUTE is 0."""
+    if settings.LLM_TOKENS_PER_MINUTE <= 0:
+        return None
+    return registry.get("llm_rate_limiter", lambda: TokenRateLimiter(settings.LLM_TOKENS_PER_MINUTE))
+
+def _cache_key(model_name: str, prompt: str, temperature: float, max_tokens: int) -> str:
+    return LLMResponseCache.make_key(model_name, build_messages(prompt), temperature, max_tokens)
+
+def _credit_usage(limiter, estimate: int, response):
+    usage = getattr(response, "usage", None)
+    if limiter is not None and usage is not None and usage.total_tokens is not None:
+        limiter.adjust(estimate - usage.total_tokens)
 
 class LLMClient:
     def __init__(self):
-        # Initialize Groq client using OpenAI-compatible API
+        # Initialize Groq client using OpenAI-compatible API; retries are handled here
         self.client = OpenAI(
             api_key=settings.GROQ_API_KEY,
-            base_url="https://api.groq.com/openai/v1"
+            base_url=GROQ_BASE_URL,
+            max_retries=0
         )
         self.model_name = "llama-3.3-70b-versatile"
+        self.rate_limiter = get_rate_limiter()
         print(f"✅ Initialized Groq LLM (model: {self.model_name})")
 
-    def generate(self, prompt: str) -> str:
-        # Use Groq API (OpenAI-compatible)
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=[
-                {"role": "system", "content": "You are a helpful QA test designer assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
+    def generate(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2000, use_cache: bool = True) -> str:
+        cache = get_llm_cache() if use_cache else None
+        if cache is not None:
+            key = _cache_key(self.model_name, prompt, temperature, max_tokens)
+            cached = cache.get(key)
+            if cached is not None:
+                print("LLM cache hit")
+                return cached
+        
+        content = self._generate(prompt, temperature, max_tokens)
+        if cache is not None:
+            cache.put(key, content)
+        return content
+
+    def _generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        estimate = estimate_tokens(prompt, max_tokens)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(estimate)
+            try:
+                # Use Groq API (OpenAI-compatible)
+                response = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=build_messages(prompt),
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                )
+                _credit_usage(self.rate_limiter, estimate, response)
+                return response.choices[0].message.content
+            except Exception as e:
+                if self.rate_limiter is not None:
+                    # A failed call consumed no tokens; release the reservation
+                    self.rate_limiter.adjust(estimate)
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == settings.LLM_MAX_RETRIES:
+                    raise
+                print(f"LLM request failed ({e}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{settings.LLM_MAX_RETRIES})")
+                time.sleep(delay)
+
+class AsyncLLMClient:
+    def __init__(self):
+        # One pooled HTTP client shared by every request in the process
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=10.0)
+        )
+        self.client = AsyncOpenAI(
+            api_key=settings.GROQ_API_KEY,
+            base_url=GROQ_BASE_URL,
+            http_client=self.http_client,
+            max_retries=0
         )
-        return response.choices[0].message.content
+        self.model_name = "llama-3.3-70b-versatile"
+        self.rate_limiter = get_rate_limiter()
+        print(f"✅ Initialized async Groq LLM (model: {self.model_name})")
+
+    async def generate(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2000, use_cache: bool = True) -> str:
+        # The cache reads and writes SQLite; keep that off the event loop
+        cache = await asyncio.to_thread(get_llm_cache) if use_cache else None
+        if cache is not None:
+            key = _cache_key(self.model_name, prompt, temperature, max_tokens)
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                print("LLM cache hit")
+                return cached
+        
+        content = await self._generate(prompt, temperature, max_tokens)
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, content)
+        return content
+
+    async def _generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        estimate = estimate_tokens(prompt, max_tokens)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(estimate)
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=build_messages(prompt),
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                )
+                _credit_usage(self.rate_limiter, estimate, response)
+                return response.choices[0].message.content
+            except Exception as e:
+                if self.rate_limiter is not None:
+                    # A failed call consumed no tokens; release the reservation
+                    self.rate_limiter.adjust(estimate)
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == settings.LLM_MAX_RETRIES:
+                    raise
+                print(f"LLM request failed ({e}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{settings.LLM_MAX_RETRIES})")
+                await asyncio.sleep(delay)
+
+    async def stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2000, use_cache: bool = True):
+        """Yield completion text deltas as they arrive.
+
+        Retries apply only to opening the stream; once tokens have been
+        yielded a failure is raised to the caller. A cached completion is
+        yielded as a single delta.
+        """
+        # The cache reads and writes SQLite; keep that off the event loop
+        cache = await asyncio.to_thread(get_llm_cache) if use_cache else None
+        if cache is not None:
+            key = _cache_key(self.model_name, prompt, temperature, max_tokens)
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                print("LLM cache hit")
+                yield cached
+                return
+        
+        parts = []
+        async for delta in self._stream(prompt, temperature, max_tokens):
+            parts.append(delta)
+            yield delta
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, "".join(parts))
+
+    async def _stream(self, prompt: str, temperature: float, max_tokens: int):
+        estimate = estimate_tokens(prompt, max_tokens)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(estimate)
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=build_messages(prompt),
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True
+                )
+                break
+            except Exception as e:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.adjust(estimate)
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == settings.LLM_MAX_RETRIES:
+                    raise
+                print(f"LLM stream failed to open ({e}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{settings.LLM_MAX_RETRIES})")
+                await asyncio.sleep(delay)
+
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def close(self):
+        await self.http_client.aclose()
+
+def get_llm_client() -> LLMClient:
+    """Get or create the shared blocking LLM client."""
+    return registry.get("llm_client", LLMClient)
+
+def get_async_llm_client() -> AsyncLLMClient:
+    """Get or create the shared async LLM client."""
+    return registry.get("async_llm_client", AsyncLLMClient)
+
+async def close_llm_clients():
+    """Close pooled connections held by the shared async client."""
+    client = registry.pop("async_llm_client")
+    if client is not None:
+        await client.close()
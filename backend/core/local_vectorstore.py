@@ -0,0 +1,222 @@
+import os
+import json
+import threading
+import numpy as np
+from backend.core.models import Chunk
+from backend.core.config import settings
+from backend.core.embeddings import get_embedding_model
+from backend.core.vectorstore import empty_query_result
+
+class LocalVectorStore:
+    """In-process exact-search vector store backed by NumPy.
+
+    Normalized embeddings are kept in one contiguous float32 matrix, so a
+    query is a single matrix-vector product followed by `argpartition` to
+    pick the top-k rows. The matrix is persisted as a .npy file and loaded
+    memory-mapped; it is copied into RAM only when it is first modified.
+    """
+
+    def __init__(self, data_dir: str = None):
+        """Initialize the local vector store, loading any persisted vectors."""
+        self.data_dir = data_dir or settings.LOCAL_VECTOR_STORE_DIR
+        self.matrix_path = os.path.join(self.data_dir, "embeddings.npy")
+        self.records_path = os.path.join(self.data_dir, "records.json")
+
+        self.embedding_model = get_embedding_model()
+        self.embedding_dimension = self.embedding_model.dimension
+
+        self._lock = threading.RLock()
+        self._matrix = np.empty((0, self.embedding_dimension), dtype=np.float32)
+        self._size = 0
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._row_of = {}
+        self._dirty = False
+
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._load()
+        print(f"✓ Local vector store ready with {self._size} vectors ({self.data_dir})")
+
+    def _load(self):
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.records_path)):
+            return
+        try:
+            with open(self.records_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            matrix = np.load(self.matrix_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not load local vector store, starting empty: {e}")
+            return
+
+        if matrix.shape != (len(records["ids"]), self.embedding_dimension):
+            print("Warning: local vector store files are inconsistent, starting empty")
+            return
+
+        self._matrix = matrix
+        self._size = len(records["ids"])
+        self._ids = records["ids"]
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+
+    def _save(self):
+        matrix_tmp = self.matrix_path + ".tmp"
+        with open(matrix_tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(self._matrix[:self._size]))
+        os.replace(matrix_tmp, self.matrix_path)
+
+        records_tmp = self.records_path + ".tmp"
+        with open(records_tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self._ids,
+                "documents": self._documents,
+                "metadatas": self._metadatas
+            }, f)
+        os.replace(records_tmp, self.records_path)
+
+    def _ensure_capacity(self, rows: int):
+        """Grow the in-memory matrix (doubling) so it holds at least `rows` rows."""
+        writable = isinstance(self._matrix, np.ndarray) and not isinstance(self._matrix, np.memmap)
+        if writable and self._matrix.shape[0] >= rows:
+            return
+        capacity = max(rows, 2 * self._matrix.shape[0], 64)
+        grown = np.empty((capacity, self.embedding_dimension), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def add_chunks(self, chunks: list[Chunk], embeddings=None):
+        """Add or overwrite chunks in the local store, embedding them unless `embeddings` are given."""
+        if not chunks:
+            print("Warning: add_chunks called with empty chunks list")
+            return
+
+        print(f"Adding {len(chunks)} chunks to local vector store")
+        if embeddings is None:
+            embeddings = self.embedding_model.encode([c.text for c in chunks])
+        embeddings = self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            self._ensure_capacity(self._size + len(chunks))
+            for chunk, embedding in zip(chunks, embeddings):
+                row = self._row_of.get(chunk.id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._row_of[chunk.id] = row
+                    self._ids.append(chunk.id)
+                    self._documents.append(chunk.text)
+                    self._metadatas.append(chunk.metadata.copy())
+                else:
+                    self._documents[row] = chunk.text
+                    self._metadatas[row] = chunk.metadata.copy()
+                self._matrix[row] = embedding
+            # Persisted by flush(), so streamed batches don't rewrite the files each time
+            self._dirty = True
+
+        print(f"Successfully added {len(chunks)} chunks to local vector store")
+
+    def query(self, query: str, top_k: int = 5):
+        """Exact cosine-similarity search over all stored vectors."""
+        return self.query_batch([query], top_k)
+
+    def query_batch(self, queries: list[str], top_k: int = 5, embeddings=None):
+        """Exact search for several queries with one matrix-matrix product.
+
+        `embeddings` are the precomputed query embeddings, if any.
+        """
+        if self._size == 0 or not queries:
+            print("Warning: Index is empty, returning no results")
+            return empty_query_result(len(queries))
+
+        if embeddings is None:
+            embeddings = self.embedding_model.encode_queries(queries)
+        query_embeddings = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            size = self._size
+            if size == 0:
+                return empty_query_result(len(queries))
+            scores = query_embeddings @ self._matrix[:size].T
+
+            k = min(top_k, size)
+            if k < size:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.tile(np.arange(size), (len(queries), 1))
+            order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+
+            results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+            for row_scores, rows in zip(scores, top):
+                results["ids"].append([self._ids[i] for i in rows])
+                results["documents"].append([self._documents[i] for i in rows])
+                results["metadatas"].append([dict(self._metadatas[i]) for i in rows])
+                results["distances"].append([float(1 - row_scores[i]) for i in rows])  # Convert similarity to distance
+            return results
+
+    def delete(self, ids: list[str]):
+        """Delete vectors by id, filling each hole with the last row (persisted on flush)."""
+        if not ids:
+            return
+
+        with self._lock:
+            self._ensure_capacity(self._size)
+            deleted = 0
+            for chunk_id in ids:
+                row = self._row_of.pop(chunk_id, None)
+                if row is None:
+                    continue
+                last = self._size - 1
+                if row != last:
+                    self._matrix[row] = self._matrix[last]
+                    self._ids[row] = self._ids[last]
+                    self._documents[row] = self._documents[last]
+                    self._metadatas[row] = self._metadatas[last]
+                    self._row_of[self._ids[row]] = row
+                self._ids.pop()
+                self._documents.pop()
+                self._metadatas.pop()
+                self._size -= 1
+                deleted += 1
+            self._dirty = self._dirty or deleted > 0  # Persisted by flush(), like additions
+        print(f"Deleted {deleted} vectors from local vector store")
+
+    def reset(self):
+        """Remove all vectors from the local store."""
+        print(f"Resetting local vector store: {self.data_dir}")
+        with self._lock:
+            self._matrix = np.empty((0, self.embedding_dimension), dtype=np.float32)
+            self._size = 0
+            self._ids = []
+            self._documents = []
+            self._metadatas = []
+            self._row_of = {}
+            self._dirty = False
+            for path in (self.matrix_path, self.records_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        print("Successfully reset local vector store")
+
+    def count(self):
+        """Return the number of stored vectors."""
+        return self._size
+
+    def count_known(self) -> bool:
+        return True
+
+    def flush(self):
+        """Persist pending additions and deletions, and the embedding cache."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+                self._dirty = False
+        self.embedding_model.flush()
+
+    def close(self):
+        """Persist anything still pending; there is nothing else to release."""
+        self.flush()
@@ -0,0 +1,121 @@
+import os
+import numpy as np
+
+# all-MiniLM-L6-v2 as configured by sentence-transformers
+HF_MODEL_PREFIX = "sentence-transformers/"
+MAX_SEQ_LENGTH = 256
+
+# Agreement with the PyTorch SentenceTransformer vectors (cosine similarity per text),
+# checked by benchmarks/embedding_backends.py
+FP32_MIN_COSINE = 0.9999
+INT8_MIN_COSINE = 0.99
+
+def onnx_model_path(model_dir: str, quantize: bool) -> str:
+    return os.path.join(model_dir, "model.int8.onnx" if quantize else "model.onnx")
+
+def export_onnx_model(model_name: str, model_dir: str, quantize: bool = True) -> str:
+    """Export the transformer behind a sentence-transformers model to ONNX (and int8).
+
+    Needs torch and transformers, so it runs once per machine; afterwards only
+    onnxruntime and tokenizers are imported. Returns the path of the model
+    file to load.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(model_dir, exist_ok=True)
+    fp32_path = onnx_model_path(model_dir, quantize=False)
+    if not os.path.exists(fp32_path):
+        print(f"Exporting '{model_name}' to ONNX...")
+        hf_name = model_name if "/" in model_name else HF_MODEL_PREFIX + model_name
+        tokenizer = AutoTokenizer.from_pretrained(hf_name)
+        model = AutoModel.from_pretrained(hf_name).eval()
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        axes = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+                fp32_path,
+                input_names=["input_ids", "attention_mask", "token_type_ids"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={"input_ids": axes, "attention_mask": axes,
+                              "token_type_ids": axes, "last_hidden_state": axes},
+                opset_version=14
+            )
+        tokenizer.save_pretrained(model_dir)
+        print(f"✓ Exported ONNX model to {fp32_path}")
+
+    if not quantize:
+        return fp32_path
+    int8_path = onnx_model_path(model_dir, quantize=True)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"✓ Quantized ONNX model to {int8_path}")
+    return int8_path
+
+class OnnxEncoder:
+    """Drop-in for SentenceTransformer.encode running the exported model on onnxruntime (CPU).
+
+    Reproduces the sentence-transformers pipeline for all-MiniLM-L6-v2:
+    WordPiece tokenization truncated to 256 tokens, mean pooling over the
+    attention mask and L2 normalization.
+    """
+
+    def __init__(self, model_name: str, model_dir: str, quantize: bool = True, threads: int = 0,
+                 batch_size: int = 32):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(f"EMBEDDING_BACKEND=onnx needs `pip install -r requirements-onnx.txt`: {e}") from e
+
+        path = onnx_model_path(model_dir, quantize)
+        if not os.path.exists(path) or not os.path.exists(os.path.join(model_dir, "tokenizer.json")):
+            path = export_onnx_model(model_name, model_dir, quantize)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.batch_size = batch_size
+        self.path = path
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        mask = feeds["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def encode(self, texts: list[str], show_progress_bar: bool = False) -> np.ndarray:
+        """Embed texts in length-sorted batches (less padding), returned in input order."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors = self._encode_batch([texts[i] for i in batch])
+            if embeddings.shape[1] == 0:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            embeddings[batch] = vectors
+        return embeddings
+
+if __name__ == "__main__":
+    # Export ahead of time (e.g. in a Docker build) so workers never need torch:
+    #   python -m backend.core.onnx_embeddings
+    from backend.core.config import settings
+    export_onnx_model("all-MiniLM-L6-v2", settings.EMBEDDING_ONNX_DIR, settings.EMBEDDING_ONNX_QUANTIZE)
@@ -0,0 +1,150 @@
+import re
+import threading
+from backend.core.config import settings
+
+# Loaded on first use: with an empty tiktoken cache the encoding file is downloaded
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+_TERM_RE = re.compile(r"[a-z0-9]+")
+
+def get_encoding():
+    """The BPE encoding used for token counts, or None when tiktoken or its encoding file is unavailable."""
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:  # tiktoken missing or its encoding file unavailable offline
+                print(f"⚠️ Token encoding unavailable, estimating ~4 chars/token: {e}")
+            _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Count tokens with a local BPE tokenizer (close to Llama 3's), or estimate ~4 chars/token."""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most `max_tokens` tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+def terms(text: str) -> set:
+    return set(_TERM_RE.findall(text.lower()))
+
+def relevance_scores(units: list[str], reference: str) -> list[float]:
+    """Score each unit by how many distinct terms it shares with the reference text."""
+    reference_terms = terms(reference)
+    return [float(len(terms(unit) & reference_terms)) for unit in units]
+
+class PromptSection:
+    """A prompt section made of units that can be kept or dropped individually.
+
+    Units are kept in order of descending score (ties keep the earlier unit)
+    and emitted in their original order.
+    """
+
+    def __init__(self, name: str, units: list[str], scores: list[float] = None,
+                 weight: float = 1.0, separator: str = "\n"):
+        self.name = name
+        self.units = [u for u in units if u and u.strip()]
+        if scores is not None:
+            scores = [s for u, s in zip(units, scores) if u and u.strip()]
+        self.scores = scores if scores is not None else [0.0] * len(self.units)
+        self.weight = weight
+        self.separator = separator
+        self.unit_tokens = [count_tokens(u) for u in self.units]
+        self.separator_tokens = count_tokens(separator)
+
+    def demand(self) -> int:
+        """Tokens needed to include every unit."""
+        if not self.units:
+            return 0
+        return sum(self.unit_tokens) + self.separator_tokens * (len(self.units) - 1)
+
+    def fit(self, budget: int) -> str:
+        """Keep the most relevant units that fit in `budget` tokens."""
+        order = sorted(range(len(self.units)), key=lambda i: (-self.scores[i], i))
+        selected = []
+        used = 0
+        for i in order:
+            cost = self.unit_tokens[i] + (self.separator_tokens if selected else 0)
+            if used + cost <= budget:
+                selected.append(i)
+                used += cost
+
+        if not selected and order and budget > 0:
+            # Nothing fits whole; keep the start of the most relevant unit
+            return truncate_tokens(self.units[order[0]], budget)
+        return self.separator.join(self.units[i] for i in sorted(selected))
+
+def allocate(sections: list[PromptSection], budget: int) -> dict:
+    """Split `budget` across sections by weight, handing unused share to sections that need more."""
+    allocation = {s.name: 0.0 for s in sections}
+    remaining = float(max(budget, 0))
+    open_sections = [s for s in sections if s.demand() > 0]
+
+    while open_sections and remaining > 0.5:
+        total_weight = sum(s.weight for s in open_sections) or 1.0
+        share = {s.name: remaining * s.weight / total_weight for s in open_sections}
+        satisfied = [s for s in open_sections if s.demand() - allocation[s.name] <= share[s.name]]
+        if not satisfied:
+            for s in open_sections:
+                allocation[s.name] += share[s.name]
+            break
+        for s in satisfied:
+            need = s.demand() - allocation[s.name]
+            allocation[s.name] += need
+            remaining -= need
+        open_sections = [s for s in open_sections if s not in satisfied]
+
+    return {name: int(tokens) for name, tokens in allocation.items()}
+
+def assemble_prompt(render, sections: list[PromptSection], budget: int = None):
+    """Fit sections into the token budget and render the prompt.
+
+    `render` receives a dict of section name -> text and returns the prompt.
+    Returns (prompt, token_counts) where token_counts reports the tokens per
+    section, the fixed template overhead, the total and the budget.
+    """
+    budget = budget if budget is not None else settings.PROMPT_TOKEN_BUDGET
+    template_tokens = count_tokens(render({s.name: "" for s in sections}))
+    allocation = allocate(sections, budget - template_tokens)
+
+    texts = {s.name: s.fit(allocation[s.name]) for s in sections}
+    section_tokens = {name: count_tokens(text) for name, text in texts.items()}
+
+    # Whole units rarely fill an allocation exactly; offer the slack to trimmed sections
+    spare = sum(allocation[name] - section_tokens[name] for name in texts)
+    for s in sorted(sections, key=lambda s: -s.weight):
+        if spare <= 0 or section_tokens[s.name] >= s.demand():
+            continue
+        refit = s.fit(section_tokens[s.name] + spare)
+        refit_tokens = count_tokens(refit)
+        if refit_tokens > section_tokens[s.name]:
+            spare -= refit_tokens - section_tokens[s.name]
+            texts[s.name] = refit
+            section_tokens[s.name] = refit_tokens
+
+    prompt = render(texts)
+    return prompt, {
+        "sections": section_tokens,
+        "dropped": {s.name: max(0, s.demand() - section_tokens[s.name]) for s in sections},
+        "template": template_tokens,
+        "total": count_tokens(prompt),
+        "budget": budget
+    }
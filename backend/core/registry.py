@@ -0,0 +1,57 @@
+import threading
+
+class Registry:
+    """Process-wide shared components, each built exactly once.
+
+    FastAPI runs sync endpoints on a thread pool, so several first requests
+    can ask for the same component at once. Each name has its own lock:
+    concurrent callers wait for the one building it instead of building
+    copies, while building one component (e.g. the vector store) may still
+    fetch another (the embedding model) from its factory.
+    """
+
+    def __init__(self):
+        self._components = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _lock_for(self, name: str) -> threading.RLock:
+        with self._lock:
+            return self._locks.setdefault(name, threading.RLock())
+
+    def get(self, name: str, factory):
+        """The component registered as `name`, built with `factory()` on first use."""
+        component = self._components.get(name)
+        if component is not None:
+            return component
+        with self._lock_for(name):
+            component = self._components.get(name)
+            if component is None:
+                component = factory()
+                self._components[name] = component
+            return component
+
+    def peek(self, name: str):
+        """The component if it was already built, else None (never builds)."""
+        return self._components.get(name)
+
+    def replace(self, name: str, factory, dispose=None):
+        """Swap in a fresh `name`, calling `dispose(previous)` before the new one is built.
+
+        Callers of get() wait until the replacement is ready.
+        """
+        with self._lock_for(name):
+            previous = self._components.pop(name, None)
+            if previous is not None and dispose is not None:
+                dispose(previous)
+            component = factory()
+            self._components[name] = component
+            return component
+
+    def pop(self, name: str):
+        """Forget `name` and return it (or None); the next get() builds a new one."""
+        with self._lock_for(name):
+            return self._components.pop(name, None)
+
+# Shared registry
+registry = Registry()
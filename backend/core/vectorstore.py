@@ -1,26 +1,72 @@
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
-import os
+from typing import Protocol
+from concurrent.futures import ThreadPoolExecutor
 import time
+import threading
 from backend.core.models import Chunk
 from backend.core.config import settings
+from backend.core.embeddings import get_embedding_model
+
+# How long a remote count below the local one is blamed on stats lag before it is accepted
+STATS_LAG_GRACE_SECONDS = 120
+
+class VectorStore(Protocol):
+    """Interface shared by all vector store backends.
+
+    `query` returns ChromaDB-style results: a dict of "ids", "documents",
+    "metadatas" and "distances", each a list holding one list per query.
+    """
+
+    def add_chunks(self, chunks: list[Chunk], embeddings=None) -> None: ...
+
+    def query(self, query: str, top_k: int = 5) -> dict: ...
+
+    def query_batch(self, queries: list[str], top_k: int = 5, embeddings=None) -> dict: ...
+
+    def reset(self) -> None: ...
+
+    def count(self) -> int: ...
+
+    def count_known(self) -> bool: ...
+
+    def delete(self, ids: list[str]) -> None: ...
+
+    def flush(self) -> None: ...
+
+    def close(self) -> None: ...
+
+def empty_query_result(num_queries: int = 1) -> dict:
+    return {
+        "ids": [[] for _ in range(num_queries)],
+        "documents": [[] for _ in range(num_queries)],
+        "metadatas": [[] for _ in range(num_queries)],
+        "distances": [[] for _ in range(num_queries)]
+    }
+
+def create_vector_store() -> VectorStore:
+    """Create the vector store backend selected by VECTOR_STORE_BACKEND."""
+    backend = settings.VECTOR_STORE_BACKEND.lower()
+    if backend == "pinecone":
+        return PineconeVectorStore()
+    if backend == "local":
+        from backend.core.local_vectorstore import LocalVectorStore
+        return LocalVectorStore()
+    raise ValueError(f"Unknown vector store backend: {settings.VECTOR_STORE_BACKEND}")
 
 class PineconeVectorStore:
     def __init__(self):
         """Initialize Pinecone vector store with sentence-transformers embeddings."""
         try:
             print("Initializing Pinecone vector store...")
+            from pinecone import Pinecone  # Deferred: the SDK is slow to import
             
             # Initialize Pinecone
             print(f"Connecting to Pinecone with API key: {settings.PINECONE_API_KEY[:10]}...")
             self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
             print("✓ Connected to Pinecone")
             
-            # Initialize embedding model (same as ChromaDB default)
-            print("Loading embedding model 'all-MiniLM-L6-v2'...")
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            self.embedding_dimension = 384  # Dimension for all-MiniLM-L6-v2
-            print("✓ Embedding model loaded")
+            # Shared embedding model (same as ChromaDB default) with its persistent cache
+            self.embedding_model = get_embedding_model()
+            self.embedding_dimension = self.embedding_model.dimension
             
             # Index configuration
             self.index_name = settings.PINECONE_INDEX_NAME
@@ -32,6 +78,30 @@ class PineconeVectorStore:
             # Connect to index
             self.index = self.pc.Index(self.index_name)
             print(f"✓ Connected to Pinecone index: {self.index_name}")
+            
+            # Vector count is tracked locally so the hot path never calls describe_index_stats.
+            # It is reconciled with the remote stats, which lag behind writes. Queries are
+            # skipped only after reset() with no later add_chunks, never on a remote 0.
+            self._count_lock = threading.Lock()
+            self._known_ids = set()
+            self._mutations = 0
+            self._vector_count = 0
+            self._known_empty = False
+            self._count_known = False  # Whether the remote stats were ever read (or the namespace reset)
+            self._unconfirmed_since = None  # When adds not yet visible in the remote stats began
+            self._refresh_count()
+            
+            # Pool for issuing batched similarity searches concurrently
+            self._query_pool = ThreadPoolExecutor(
+                max_workers=settings.PINECONE_QUERY_CONCURRENCY, thread_name_prefix="pinecone-query"
+            )
+
+            
+            # Background reconciliation with the remote stats
+            self._reconcile_now = threading.Event()
+            self._closed = threading.Event()
+            if settings.PINECONE_STATS_REFRESH_SECONDS > 0:
+                threading.Thread(target=self._reconcile_loop, name="pinecone-stats", daemon=True).start()
         except Exception as e:
             print(f"❌ ERROR initializing Pinecone vector store: {e}")
             import traceback
@@ -44,6 +114,7 @@ class PineconeVectorStore:
         
         if self.index_name not in existing_indexes:
             print(f"Creating new Pinecone index: {self.index_name}")
+            from pinecone import ServerlessSpec
             self.pc.create_index(
                 name=self.index_name,
                 dimension=self.embedding_dimension,
@@ -61,73 +132,144 @@ class PineconeVectorStore:
         else:
             print(f"Using existing Pinecone index: {self.index_name}")
     
+    def _fetch_remote_count(self) -> int:
+        stats = self.index.describe_index_stats()
+        return stats.get('namespaces', {}).get(self.namespace, {}).get('vector_count', 0)
+    
+    def _refresh_count(self):
+        """Replace the local vector count with the remote one, unless the remote stats still lag recent adds."""
+        try:
+            with self._count_lock:
+                mutations = self._mutations
+            remote_count = self._fetch_remote_count()
+            retry = False
+            with self._count_lock:
+                self._count_known = True
+                # Only trust the remote value if no write raced with the request
+                if mutations == self._mutations:
+                    lagging = self._unconfirmed_since is not None and remote_count < self._vector_count
+                    if lagging and time.monotonic() - self._unconfirmed_since < STATS_LAG_GRACE_SECONDS:
+                        retry = True  # Recent adds haven't shown up yet; keep the local count
+                    else:
+                        self._vector_count = remote_count
+                        self._unconfirmed_since = None
+            if retry:
+                self._reconcile_now.set()
+        except Exception as e:
+            print(f"Error refreshing vector count: {e}")
+    
+    def _reconcile_loop(self):
+        while not self._closed.is_set():
+            if self._reconcile_now.wait(settings.PINECONE_STATS_REFRESH_SECONDS):
+                self._reconcile_now.clear()
+                # Give recent writes a moment to show up in the index stats
+                if self._closed.wait(2):
+                    break
+            if self._closed.is_set():
+                break
+            self._refresh_count()
+    
+    def _record_mutation(self, delta: int):
+        """Apply a local count change after a write and schedule a reconcile."""
+        with self._count_lock:
+            self._mutations += 1
+            self._vector_count = max(0, self._vector_count + delta)
+            if delta > 0 and self._unconfirmed_since is None:
+                self._unconfirmed_since = time.monotonic()
+        self._reconcile_now.set()
+    
     def _generate_embeddings(self, texts: list[str]) -> list[list[float]]:
         """Generate embeddings for a list of texts."""
-        embeddings = self.embedding_model.encode(texts, show_progress_bar=False)
-        return embeddings.tolist()
+        return self.embedding_model.encode(texts).tolist()
     
-    def add_chunks(self, chunks: list[Chunk]):
-        """Add chunks to Pinecone index."""
+    def add_chunks(self, chunks: list[Chunk], embeddings=None):
+        """Add chunks to Pinecone index.
+
+        Chunks are upserted 100 at a time (the Pinecone limit). Builds pass
+        precomputed `embeddings` (an array, one row per chunk), embedded and
+        upserted concurrently by the ingestion pipeline; without them each
+        batch is embedded here first.
+        """
         if not chunks:
             print("Warning: add_chunks called with empty chunks list")
             return
         
         print(f"Adding {len(chunks)} chunks to Pinecone")
         
-        # Prepare data for upsert
-        texts = [c.text for c in chunks]
-        embeddings = self._generate_embeddings(texts)
-        
-        # Create vectors for Pinecone (id, embedding, metadata)
-        vectors = []
-        for chunk, embedding in zip(chunks, embeddings):
-            # Add text to metadata for retrieval
-            metadata = chunk.metadata.copy()
-            metadata['text'] = chunk.text
-            
-            vectors.append({
-                'id': chunk.id,
-                'values': embedding,
-                'metadata': metadata
-            })
-        
-        # Upsert in batches of 100 (Pinecone limit)
         batch_size = 100
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            self.index.upsert(vectors=batch, namespace=self.namespace)
-            print(f"Upserted batch {i//batch_size + 1}/{(len(vectors)-1)//batch_size + 1}")
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i:i + batch_size]
+            if embeddings is None:
+                batch_embeddings = self._generate_embeddings([c.text for c in batch])
+            else:
+                batch_embeddings = embeddings[i:i + batch_size].tolist()
+            
+            # Create vectors for Pinecone (id, embedding, metadata)
+            vectors = []
+            for chunk, embedding in zip(batch, batch_embeddings):
+                # Add text to metadata for retrieval
+                metadata = chunk.metadata.copy()
+                metadata['text'] = chunk.text
+                
+                vectors.append({
+                    'id': chunk.id,
+                    'values': embedding,
+                    'metadata': metadata
+                })
+            
+            self.index.upsert(vectors=vectors, namespace=self.namespace)
+        
+        # Ids seen before in this process are overwrites; earlier ones are reconciled later
+        with self._count_lock:
+            new_ids = {c.id for c in chunks} - self._known_ids
+            self._known_ids.update(new_ids)
+            self._known_empty = False
+        self._record_mutation(len(new_ids))
         
         print(f"Successfully added {len(chunks)} chunks to Pinecone")
     
+    def flush(self):
+        """Persist the embedding cache (upserts are synchronous)."""
+        self.embedding_model.flush()
+    
     def query(self, query: str, top_k: int = 5):
         """Query Pinecone index for similar chunks."""
+        return self.query_batch([query], top_k)
+    
+    def query_batch(self, queries: list[str], top_k: int = 5, embeddings=None):
+        """Query Pinecone for several texts: one embedding pass (skipped when `embeddings` are given), concurrent searches."""
         try:
-            # Check if index is empty
-            stats = self.index.describe_index_stats()
-            total_vectors = stats.get('namespaces', {}).get(self.namespace, {}).get('vector_count', 0)
+            # Skip the search only when this process emptied the namespace and added nothing since
+            with self._count_lock:
+                known_empty = self._known_empty
             
-            if total_vectors == 0:
+            if known_empty or not queries:
                 print("Warning: Index is empty, returning no results")
-                return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+                return empty_query_result(len(queries))
             
-            # Generate query embedding
-            query_embedding = self._generate_embeddings([query])[0]
+            # Generate all query embeddings in a single encode call
+            if embeddings is None:
+                embeddings = self.embedding_model.encode_queries(queries)
+            query_embeddings = embeddings.tolist()
             
-            # Query Pinecone
-            results = self.index.query(
-                vector=query_embedding,
-                top_k=top_k,
-                namespace=self.namespace,
-                include_metadata=True
-            )
+            # Query Pinecone, one request per query issued concurrently
+            def search(query_embedding):
+                return self.index.query(
+                    vector=query_embedding,
+                    top_k=top_k,
+                    namespace=self.namespace,
+                    include_metadata=True
+                )
+            all_results = list(self._query_pool.map(search, query_embeddings))
             
             # Format results to match ChromaDB structure
-            ids = [[match['id'] for match in results['matches']]]
-            documents = [[match['metadata'].get('text', '') for match in results['matches']]]
-            metadatas = [[{k: v for k, v in match['metadata'].items() if k != 'text'} 
-                          for match in results['matches']]]
-            distances = [[1 - match['score'] for match in results['matches']]]  # Convert similarity to distance
+            ids, documents, metadatas, distances = [], [], [], []
+            for results in all_results:
+                ids.append([match['id'] for match in results['matches']])
+                documents.append([match['metadata'].get('text', '') for match in results['matches']])
+                metadatas.append([{k: v for k, v in match['metadata'].items() if k != 'text'} 
+                                  for match in results['matches']])
+                distances.append([1 - match['score'] for match in results['matches']])  # Convert similarity to distance
             
             return {
                 "ids": ids,
@@ -139,7 +281,7 @@ class PineconeVectorStore:
             print(f"Error querying Pinecone: {e}")
             import traceback
             traceback.print_exc()
-            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+            return empty_query_result(len(queries))
     
     def reset(self):
         """Reset the vector store by deleting all vectors in the namespace."""
@@ -150,13 +292,13 @@ class PineconeVectorStore:
             self.index.delete(delete_all=True, namespace=self.namespace)
             print(f"Successfully reset namespace {self.namespace}")
             
-            # Wait a moment for deletion to propagate
-            time.sleep(1)
-            
-            # Verify reset
-            stats = self.index.describe_index_stats()
-            count = stats.get('namespaces', {}).get(self.namespace, {}).get('vector_count', 0)
-            print(f"Vector count after reset: {count}")
+            with self._count_lock:
+                self._mutations += 1
+                self._known_ids.clear()
+                self._vector_count = 0
+                self._known_empty = True
+                self._count_known = True
+                self._unconfirmed_since = None
             
         except Exception as e:
             print(f"Error during reset: {e}")
@@ -164,12 +306,38 @@ class PineconeVectorStore:
             traceback.print_exc()
             raise
     
+    def delete(self, ids: list[str]):
+        """Delete vectors by id from the namespace."""
+        if not ids:
+            return
+
+        # Pinecone accepts at most 1000 ids per delete request
+        batch_size = 1000
+        for i in range(0, len(ids), batch_size):
+            self.index.delete(ids=ids[i:i + batch_size], namespace=self.namespace)
+        print(f"Deleted {len(ids)} vectors from Pinecone")
+        
+        with self._count_lock:
+            self._known_ids.difference_update(ids)
+        self._record_mutation(-len(ids))
+
     def count(self):
-        """Return the number of vectors in the namespace."""
-        try:
-            stats = self.index.describe_index_stats()
-            count = stats.get('namespaces', {}).get(self.namespace, {}).get('vector_count', 0)
-            return count
-        except Exception as e:
-            print(f"Error getting count: {e}")
-            return 0
+        """Return the number of vectors in the namespace (tracked locally, reconciled in the background)."""
+        with self._count_lock:
+            return self._vector_count
+
+    def count_known(self) -> bool:
+        """Whether `count` reflects the remote stats; retries reading them if they never could be."""
+        with self._count_lock:
+            known = self._count_known
+        if not known:
+            self._refresh_count()
+            with self._count_lock:
+                known = self._count_known
+        return known
+    
+    def close(self):
+        """Stop the background stats reconciliation and the query pool."""
+        self._closed.set()
+        self._reconcile_now.set()
+        self._query_pool.shutdown(wait=False)
@@ -1,8 +1,19 @@
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from backend.api import docs_api, agent_api
+from backend.api.upload_limits import UploadSizeLimitMiddleware
+from backend.core.config import settings
+from backend.core.llm_client import close_llm_clients
+from backend.services.startup import readiness_report, start_warmup
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 
+# Heavy dependencies (torch, sentence-transformers, pinecone, fitz, bs4) are imported on first use
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -11,13 +22,20 @@ app = FastAPI(title="QA Testing Brain")
 
 @app.on_event("startup")
 async def startup_event():
-    """Log startup information"""
+    """Log startup information and start warming components in the background"""
     logger.info("=" * 70)
     logger.info("QA Testing Brain API Starting Up")
     logger.info("=" * 70)
-    logger.info("Application is ready to accept connections")
+    logger.info(f"Application modules imported in {IMPORT_SECONDS:.2f}s")
+    start_warmup()
+    logger.info("Application is ready to accept connections (see /ready for warmup)")
     logger.info("=" * 70)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the pooled LLM HTTP connections"""
+    await close_llm_clients()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,6 +44,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Oversized upload requests are refused before their body is read
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={"/kb/docs/upload": settings.UPLOAD_MAX_DOC_MB, "/kb/html/upload": settings.UPLOAD_MAX_HTML_MB},
+    max_files=settings.UPLOAD_MAX_FILES
+)
+
 app.include_router(docs_api.router, prefix="/kb", tags=["knowledge-base"])
 app.include_router(agent_api.router, prefix="/agent", tags=["agent"])
 
@@ -36,6 +61,7 @@ def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "knowledge_base": "/kb",
             "agent": "/agent"
         }
@@ -43,4 +69,12 @@ def root():
 
 @app.get("/health")
 def health():
+    """Liveness: the process is up and serving."""
     return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once the models and vector store are loaded, 503 while warming or after a failure."""
+    report = readiness_report()
+    report["import_seconds"] = round(IMPORT_SECONDS, 3)
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
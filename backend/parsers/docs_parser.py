@@ -1,22 +1,73 @@
 import json
-import fitz  # pymupdf
+from concurrent.futures import ProcessPoolExecutor
+from backend.core.config import settings
+
+# Pages extracted per process-pool task
+PDF_PAGES_PER_TASK = 8
 
 def parse_txt_md(path: str) -> str:
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
+def _extract_pages(path: str, start: int, stop: int) -> list[str]:
+    """Extract the text of pages [start, stop); runs in a worker process for large PDFs."""
+    import fitz  # pymupdf
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+def iter_pdf_pages(path: str, workers: int = None):
+    """Yield (page_number, text) for each page, 1-based and in order.
+
+    Large PDFs are extracted by a process pool of `workers` processes
+    (default PDF_PARSE_WORKERS) in ranges of PDF_PAGES_PER_TASK pages, with
+    only a few ranges in flight, so memory stays bounded by a handful of
+    pages whatever the document size.
+    """
+    import fitz  # pymupdf, deferred so importing the app stays cheap
+    with fitz.open(path) as doc:
+        page_count = doc.page_count
+        workers = settings.PDF_PARSE_WORKERS if workers is None else workers
+        if workers <= 1 or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+            for i in range(page_count):
+                yield i + 1, doc[i].get_text()
+            return
+
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    print(f"Extracting {page_count} PDF pages with {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = [pool.submit(_extract_pages, path, *r) for r in ranges[:workers * 2]]
+        next_range = len(pending)
+        page_number = 1
+        try:
+            while pending:
+                texts = pending.pop(0).result()
+                if next_range < len(ranges):
+                    pending.append(pool.submit(_extract_pages, path, *ranges[next_range]))
+                    next_range += 1
+                for text in texts:
+                    yield page_number, text
+                    page_number += 1
+        finally:
+            # Consumer stopped early (or a page failed); don't extract the rest
+            for future in pending:
+                future.cancel()
+
 def parse_pdf(path: str) -> str:
-    text = ""
-    doc = fitz.open(path)
-    for page in doc:
-        text += page.get_text()
-    return text
+    return "".join(text for _, text in iter_pdf_pages(path))
 
 def parse_json(path: str) -> str:
     with open(path, "r", encoding="utf-8") as f:
         data = json.load(f)
     return json.dumps(data, indent=2)
 
+def iter_document_pages(path: str, pdf_workers: int = None):
+    """Yield (page_number, text) segments of a document; formats without pages yield (None, text) once."""
+    if path.endswith(".pdf"):
+        yield from iter_pdf_pages(path, pdf_workers)
+    else:
+        yield None, parse_document(path)
+
 def parse_document(path: str) -> str:
     if path.endswith(".txt") or path.endswith(".md"):
         return parse_txt_md(path)
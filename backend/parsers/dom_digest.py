@@ -0,0 +1,136 @@
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bs4 import Tag
+
+# Markup that never helps locate or assert on an element
+STRIPPED_TAGS = ["script", "style", "noscript", "template", "svg", "canvas", "iframe", "meta", "link", "head"]
+INTERACTIVE_TAGS = {"input", "select", "textarea", "button", "a"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+TEXT_TAGS = {"p", "span", "li", "td", "th", "strong", "em", "b", "legend", "caption", "dt", "dd", "small"}
+MESSAGE_HINT = re.compile(r"message|error|success|alert|result|status|toast|notice|warning|total|summary|cart|price", re.I)
+MAX_TEXT = 80
+MAX_OPTIONS = 10
+
+def _clean(text: str, limit: int = MAX_TEXT) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def _selector(el: "Tag") -> str:
+    if el.get("id"):
+        return f"#{el['id']}"
+    if el.get("name"):
+        value = f'[value="{el["value"]}"]' if el.get("type") in ("radio", "checkbox") and el.get("value") else ""
+        return f'{el.name}[name="{el["name"]}"]{value}'
+    classes = el.get("class") or []
+    return el.name + "".join(f".{c}" for c in classes)
+
+def _is_hidden(el: "Tag") -> bool:
+    style = (el.get("style") or "").replace(" ", "").lower()
+    return el.has_attr("hidden") or "display:none" in style or el.get("type") == "hidden"
+
+def _label_for(el: "Tag", labels: dict) -> str:
+    """Find the human-readable label of a form control."""
+    if el.get("id") and el["id"] in labels:
+        return labels[el["id"]]
+    wrapping = el.find_parent("label")
+    if wrapping is not None:
+        return _clean(wrapping.get_text(" "))
+    return el.get("aria-label") or el.get("title") or ""
+
+def _describe_control(el: "Tag", labels: dict) -> str:
+    kind = el.get("type", "text") if el.name == "input" else el.get("type")
+    parts = [f"{el.name}[{kind}]" if kind else el.name, _selector(el)]
+    if el.get("id") and el.get("name"):
+        parts.append(f'name="{el["name"]}"')
+
+    label = _label_for(el, labels)
+    if label:
+        parts.append(f'label="{label}"')
+    text = _clean(el.get_text(" ")) if el.name in ("button", "a") else ""
+    if text:
+        parts.append(f'text="{text}"')
+    for attr in ("placeholder", "href"):
+        if el.get(attr) and not (attr == "href" and el[attr].startswith("javascript")):
+            parts.append(f'{attr}="{_clean(el[attr])}"')
+    for flag in ("required", "checked", "disabled", "readonly"):
+        if el.has_attr(flag):
+            parts.append(flag)
+    handler = el.get("onclick") or el.get("onchange")
+    if handler:
+        parts.append(f"on={_clean(handler, 60)}")
+    if el.name == "select":
+        options = [_clean(o.get("value") or o.get_text(" "), 30) for o in el.find_all("option")]
+        more = f" +{len(options) - MAX_OPTIONS}" if len(options) > MAX_OPTIONS else ""
+        parts.append(f"options=[{', '.join(options[:MAX_OPTIONS])}{more}]")
+    if _is_hidden(el):
+        parts.append("(hidden)")
+    return " ".join(parts)
+
+def _is_message_container(el: "Tag") -> bool:
+    if el.name not in ("div", "span", "p", "section", "output") or el.find(list(INTERACTIVE_TAGS)):
+        return False
+    if not el.get("id") and el.find(id=True):
+        # Let the identifiable children speak for themselves
+        return False
+    if el.get("role") in ("alert", "status") or el.has_attr("aria-live"):
+        return True
+    hints = " ".join([el.get("id") or ""] + (el.get("class") or []))
+    return bool(hints.strip()) and bool(MESSAGE_HINT.search(hints))
+
+def build_dom_digest(html: str) -> str:
+    """Reduce a page to the parts a test script needs, one element per line.
+
+    Keeps forms, interactive elements with their labels, headings, short
+    visible text anchors and message/result containers (error, success,
+    total, ...). Scripts, styles and decorative wrappers are dropped.
+    """
+    from bs4 import BeautifulSoup  # Deferred: only needed once a page is digested
+
+    soup = BeautifulSoup(html, "html.parser")
+    title = _clean(soup.title.get_text(" ")) if soup.title else ""
+    for el in soup.find_all(STRIPPED_TAGS):
+        el.decompose()
+
+    labels = {
+        label["for"]: _clean(label.get_text(" "))
+        for label in soup.find_all("label") if label.get("for")
+    }
+
+    lines = [f'page title="{title}"'] if title else []
+    emitted = set()  # ids of elements already covered by an emitted line
+
+    for el in soup.find_all(True):
+        if any(id(parent) in emitted for parent in el.parents):
+            continue
+        indent = "  " * len(el.find_parents("form"))
+
+        if el.name == "form":
+            action = f' action="{el["action"]}"' if el.get("action") else ""
+            handler = f" on={_clean(el['onsubmit'], 60)}" if el.get("onsubmit") else ""
+            lines.append(f"{indent}form {_selector(el)}{action}{handler}")
+        elif el.name in INTERACTIVE_TAGS or el.get("role") == "button" or el.has_attr("onclick"):
+            if el.name == "a" and not el.get_text(strip=True):
+                continue
+            lines.append(indent + _describe_control(el, labels))
+            emitted.add(id(el))
+        elif el.name in HEADING_TAGS:
+            lines.append(f'{indent}{el.name} "{_clean(el.get_text(" "))}"')
+            emitted.add(id(el))
+        elif _is_message_container(el):
+            text = _clean(el.get_text(" "))
+            hidden = " (hidden)" if _is_hidden(el) else ""
+            lines.append(f'{indent}message {_selector(el)}' + (f' text="{text}"' if text else "") + hidden)
+            emitted.add(id(el))
+        elif el.name in TEXT_TAGS and not el.find_parent("label"):
+            # Leaf text only; containers are described through their children
+            if el.find(lambda child: child.name not in ("b", "strong", "em", "i", "br")):
+                continue
+            text = _clean(el.get_text(" "))
+            if text:
+                anchor = f" #{el['id']}" if el.get("id") else ""
+                lines.append(f'{indent}text{anchor} "{text}"')
+                emitted.add(id(el))
+
+    return "\n".join(lines)
@@ -1,4 +1,3 @@
-from bs4 import BeautifulSoup
 from backend.core.models import UIElement
 import uuid
 
@@ -6,6 +5,8 @@ def parse_html(path: str):
     with open(path, "r", encoding="utf-8") as f:
         html = f.read()
 
+    from bs4 import BeautifulSoup  # Deferred so importing the app stays cheap
+
     soup = BeautifulSoup(html, "html.parser")
     elements = []
 
@@ -1,25 +1,64 @@
+from bisect import bisect_right
 from backend.core.models import Chunk
-import uuid
 
-def chunk_text(doc_id: str, text: str, chunk_size=700, overlap=120):
-    chunks = []
+def iter_chunks(doc_id: str, pages, chunk_size=700, overlap=120):
+    """Yield overlapping chunks from (page_number, text) segments as they arrive.
+
+    Segments are treated as one continuous text, so chunks may span a page
+    break; each chunk records the page it starts on (and ends on, if
+    different). Only the text not yet chunked is buffered.
+
+    Chunk ids are deterministic (doc id + character offset) so re-ingesting a
+    document overwrites its previous vectors instead of duplicating them.
+    """
+    step = chunk_size - overlap
+    buffer = ""
+    buffer_start = 0  # offset of buffer[0] in the whole text
+    page_starts, page_numbers = [], []
     start = 0
     index = 0
 
-    while start < len(text):
-        end = start + chunk_size
-        chunk_text = text[start:end]
-        
-        chunks.append(
-            Chunk(
-                id=str(uuid.uuid4()),
-                doc_id=doc_id,
-                text=chunk_text,
-                metadata={"chunk_index": index}
-            )
+    def make_chunk(end: int) -> Chunk:
+        metadata = {"chunk_index": index, "offset": start}
+        if page_numbers:
+            first = page_numbers[bisect_right(page_starts, start) - 1]
+            last = page_numbers[bisect_right(page_starts, end - 1) - 1]
+            metadata["page"] = first
+            if last != first:
+                metadata["page_end"] = last
+        return Chunk(
+            id=f"{doc_id}-{start}",
+            doc_id=doc_id,
+            text=buffer[start - buffer_start:end - buffer_start],
+            metadata=metadata
         )
-        
-        start = end - overlap
+
+    for page_number, text in pages:
+        if not text:
+            continue
+        if page_number is not None:
+            page_starts.append(buffer_start + len(buffer))
+            page_numbers.append(page_number)
+        buffer += text
+
+        end_of_text = buffer_start + len(buffer)
+        while start + chunk_size <= end_of_text:
+            yield make_chunk(start + chunk_size)
+            start += step
+            index += 1
+
+        # Drop text and page marks that no later chunk can reach
+        buffer = buffer[start - buffer_start:]
+        buffer_start = start
+        keep = max(bisect_right(page_starts, start) - 1, 0)
+        del page_starts[:keep], page_numbers[:keep]
+
+    end_of_text = buffer_start + len(buffer)
+    while start < end_of_text:
+        yield make_chunk(min(start + chunk_size, end_of_text))
+        start += step
         index += 1
 
-    return chunks
+def chunk_text(doc_id: str, text: str, chunk_size=700, overlap=120):
+    """Split text into overlapping chunks."""
+    return list(iter_chunks(doc_id, [(None, text)], chunk_size, overlap))
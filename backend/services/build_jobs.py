@@ -0,0 +1,171 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from backend.core.registry import registry
+from backend.services.kb_service import build_knowledge_base, knowledge_base_busy
+
+# Finished jobs kept for polling
+MAX_FINISHED_JOBS = 20
+
+class BuildJob:
+    """A knowledge base build running in a background thread."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = "queued"  # queued -> running -> completed | failed | cancelled
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def update_progress(self, progress: dict):
+        with self._lock:
+            self.progress = progress
+
+    def _estimates(self, progress: dict, elapsed: float) -> dict:
+        """Throughput and ETA from upserted chunks, extrapolating unparsed files from the average so far."""
+        upserted = progress.get("chunks_upserted", 0)
+        throughput = upserted / elapsed if elapsed > 0 else 0.0
+        files_done = progress.get("files_done", 0)
+        files_left = progress.get("files_total", 0) - files_done
+        queued = progress.get("chunks_queued", 0)
+
+        eta = None
+        if self.status == "running" and throughput > 0 and files_done > 0:
+            remaining = (queued - upserted) + files_left * queued / files_done
+            eta = round(remaining / throughput, 1)
+        return {"chunks_per_second": round(throughput, 1), "eta_seconds": eta}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            progress = dict(self.progress)
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(elapsed, 1),
+            "progress": {**progress, **self._estimates(progress, elapsed)},
+            "cancel_requested": self.cancel_event.is_set(),
+            "result": self.result,
+            "error": self.error
+        }
+
+class BuildJobs:
+    """Starts builds in the background and keeps recent jobs for polling."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job id -> BuildJob, oldest first
+        self._active = None
+        self._follow_up = None  # Queued job to run after the active one (files added meanwhile)
+
+    def _launch(self, job: BuildJob):
+        """Make `job` the active build and run it in a background thread (call with the lock held)."""
+        self._active = job
+        self._prune()
+        threading.Thread(target=self._run, args=(job,), name=f"kb-build-{job.id}", daemon=True).start()
+
+    def start(self):
+        """Start a build; returns (job, True), or (running job, False) if one is already in progress."""
+        with self._lock:
+            if self._active is not None and self._active.finished_at is None:
+                return self._active, False
+            if knowledge_base_busy():
+                return None, False
+            job = BuildJob()
+            self._jobs[job.id] = job
+            self._launch(job)
+        return job, True
+
+    def request(self):
+        """Make sure newly added files get built: start a build now, or queue one after the running one.
+
+        The running build listed its files before they arrived, so the job
+        returned is the one that will build them: a new build, or the queued
+        follow-up (shared by every request made while the build runs).
+        Returns None if a reset is in progress.
+        """
+        with self._lock:
+            active = self._active
+            if active is not None and active.finished_at is None:
+                if self._follow_up is None:
+                    self._follow_up = BuildJob()
+                    self._jobs[self._follow_up.id] = self._follow_up
+                    print(f"Build {active.id} is running; queued follow-up build {self._follow_up.id}")
+                return self._follow_up
+        job, _ = self.start()
+        return job
+
+    def _start_follow_up(self, previous: BuildJob, job: BuildJob):
+        """Run the queued `job` now that `previous` finished, unless cancelled (call with the lock held)."""
+        if previous.status == "cancelled":
+            job.status, job.error = "cancelled", f"Not started: build {previous.id} was cancelled"
+        elif job.cancel_event.is_set():
+            job.status, job.error = "cancelled", "Cancelled before it started"
+        elif knowledge_base_busy():
+            job.status, job.error = "failed", "A knowledge base reset is in progress"
+        else:
+            self._launch(job)
+            return
+        job.finished_at = time.time()
+        print(f"Build job {job.id} {job.status}: {job.error}")
+
+    def _run(self, job: BuildJob):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            result = build_knowledge_base(on_progress=job.update_progress, cancel_event=job.cancel_event)
+            job.result = result
+            status = result.get("status")
+            if status == "cancelled":
+                job.status = "cancelled"
+            elif status in ("error", "busy"):
+                job.status = "failed"
+                job.error = result.get("error")
+            else:
+                job.status = "completed"
+        except Exception as e:
+            print(f"✗ Build job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+                follow_up, self._follow_up = self._follow_up, None
+                if follow_up is not None:
+                    self._start_follow_up(job, follow_up)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def cancel(self, job_id: str):
+        """Request cancellation; returns the job, or None if unknown."""
+        job = self.get(job_id)
+        if job is not None and job.finished_at is None:
+            job.cancel_event.set()
+            print(f"Cancellation requested for build job {job_id}")
+        return job
+
+def get_build_jobs() -> BuildJobs:
+    """Get the shared build job registry."""
+    return registry.get("build_jobs", BuildJobs)
@@ -0,0 +1,398 @@
+import time
+import queue
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from backend.core.config import settings
+from backend.core.embeddings import EmbeddingModel
+from backend.core.bulk_embeddings import BulkEmbedder
+from backend.parsers.docs_parser import iter_document_pages
+from backend.parsers.text_chunker import iter_chunks
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+# Set in each parser worker: the queue chunk batches go to and the cancellation flag
+_parser_output = None
+_parser_stop = None
+
+def _init_parser(output, stop):
+    global _parser_output, _parser_stop
+    _parser_output, _parser_stop = output, stop
+
+def parse_file(path: str, doc_id: str, filename: str, batch_size: int, pdf_workers: int = 1):
+    """Parse and chunk one file in a parser worker, sending chunks to the pipeline as they are produced.
+
+    Puts ("chunks", filename, batch) messages of up to `batch_size` chunks
+    on the bounded output queue, so at most a few batches of a document are
+    in memory however large it is, then ("done", filename, busy_seconds,
+    blocked_seconds) or ("error", filename, message).
+    """
+    started = time.perf_counter()
+    blocked = 0.0
+
+    def send(message):
+        nonlocal blocked
+        put_started = time.perf_counter()
+        _parser_output.put(message)
+        blocked += time.perf_counter() - put_started
+
+    try:
+        batch = []
+        for chunk in iter_chunks(doc_id, iter_document_pages(path, pdf_workers=pdf_workers)):
+            if _parser_stop.is_set():
+                send(("error", filename, "cancelled"))
+                return
+            chunk.metadata["source"] = filename
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                send(("chunks", filename, batch))
+                batch = []
+        if batch:
+            send(("chunks", filename, batch))
+        send(("done", filename, time.perf_counter() - started - blocked, blocked))
+    except Exception as e:
+        traceback.print_exc()
+        send(("error", filename, str(e)))
+
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0  # Time spent waiting on a full downstream queue
+        self._lock = threading.Lock()
+
+    def record(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.batches += 1
+            self.busy_seconds += seconds
+
+    def blocked(self, seconds: float):
+        with self._lock:
+            self.blocked_seconds += seconds
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "items": self.items,
+                "batches": self.batches,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "blocked_seconds": round(self.blocked_seconds, 3),
+                "items_per_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds else 0.0
+            }
+
+class IngestPipeline:
+    """Staged ingestion: parse (process pool) -> embed (one thread) -> upsert (thread pool).
+
+    Stages are connected by bounded queues, so a slow stage stalls the
+    stages before it (backpressure) instead of letting work pile up in
+    memory. Parsers stream each document in batches of `batch_size` chunks,
+    and with fewer files than parser workers the spare workers extract the
+    pages of large PDFs in parallel. The single embedding worker batches chunks across documents to
+    keep the model busy; upsert workers write to the vector store
+    concurrently while the next batch is embedded. Once a run has queued
+    `bulk_min_chunks` chunks to embed, embedding moves to a BulkEmbedder
+    process pool so large builds use every core.
+    """
+
+    def __init__(self, vector_store, embedding_model, text_hash, parse_workers: int = None,
+                 upsert_workers: int = None, batch_size: int = None, queue_size: int = None,
+                 on_progress=None, cancel_event: threading.Event = None, bulk_workers: int = None,
+                 bulk_min_chunks: int = None):
+        self.vector_store = vector_store
+        self.embedding_model = embedding_model
+        self.text_hash = text_hash
+        self.on_progress = on_progress  # Called with progress() after every parsed file and upserted batch
+        self.cancel_event = cancel_event or threading.Event()
+        self.parse_workers = max(1, parse_workers or settings.INGEST_PARSE_WORKERS)
+        self.upsert_workers = max(1, upsert_workers or settings.INGEST_UPSERT_WORKERS)
+        self.batch_size = max(1, batch_size or settings.INGEST_BATCH_SIZE)
+        self.queue_size = max(1, queue_size or settings.INGEST_QUEUE_SIZE)
+        self.bulk_workers = bulk_workers or settings.BULK_EMBED_WORKERS
+        self.bulk_min_chunks = settings.BULK_EMBED_MIN_CHUNKS if bulk_min_chunks is None else bulk_min_chunks
+        self._bulk = None  # BulkEmbedder once the run is large enough
+        self._bulk_unavailable = False
+
+        self.stats = {name: StageStats(name) for name in ("parse", "embed", "upsert")}
+        self._failed = {}  # filename -> error message
+        self._outstanding = {}  # filename -> chunks queued but not yet upserted
+        self._progress_lock = threading.Lock()
+        self._files_total = 0
+        self._files_done = 0
+        self._chunks_queued = 0
+
+    def _fail(self, filenames, error):
+        with self._progress_lock:
+            for filename in filenames:
+                self._failed.setdefault(filename, str(error))
+
+    def progress(self) -> dict:
+        """Snapshot of how far the run got."""
+        with self._progress_lock:
+            return {
+                "files_total": self._files_total,
+                "files_done": self._files_done,
+                "files_failed": len(self._failed),
+                "chunks_queued": self._chunks_queued,
+                "chunks_embedded": self.stats["embed"].items,
+                "chunks_upserted": self.stats["upsert"].items
+            }
+
+    def _report(self):
+        if self.on_progress is not None:
+            try:
+                self.on_progress(self.progress())
+            except Exception as e:
+                print(f"Progress callback failed: {e}")
+
+    def _put(self, q: queue.Queue, item, stage: StageStats):
+        started = time.perf_counter()
+        q.put(item)
+        stage.blocked(time.perf_counter() - started)
+
+    def _encode(self, texts: list[str]):
+        """Embed on the process pool once the run is big enough, in-process before that (embed thread only)."""
+        if self._bulk is None and not self._bulk_unavailable:
+            with self._progress_lock:
+                large = self._chunks_queued >= self.bulk_min_chunks
+            # A remote embedding server already owns the model; don't load more copies here
+            if large and self.bulk_workers > 1 and isinstance(self.embedding_model, EmbeddingModel):
+                try:
+                    print(f"{self._chunks_queued} chunks to embed, switching to {self.bulk_workers} embedding processes")
+                    self._bulk = BulkEmbedder(self.embedding_model, self.bulk_workers)
+                except Exception as e:
+                    print(f"⚠️ Could not start embedding processes, embedding in-process: {e}")
+                    self._bulk_unavailable = True
+        if self._bulk is not None:
+            return self._bulk.encode(texts)
+        return self.embedding_model.encode(texts)
+
+    def _embed_worker(self, embed_queue: queue.Queue, upsert_queue: queue.Queue):
+        stage = self.stats["embed"]
+        buffer = []
+
+        def emit(batch: list):
+            try:
+                started = time.perf_counter()
+                embeddings = self._encode([c.text for c in batch])
+                stage.record(len(batch), time.perf_counter() - started)
+                self._put(upsert_queue, (batch, embeddings), stage)
+            except Exception as e:
+                print(f"✗ Embedding batch failed: {e}")
+                self._fail({c.metadata["source"] for c in batch}, e)
+
+        while True:
+            try:
+                # Don't sit on a partial batch while the parsers are busy
+                item = embed_queue.get(timeout=0.05 if buffer else None)
+            except queue.Empty:
+                emit(buffer)
+                buffer = []
+                continue
+            if item is _DONE:
+                break
+            if self.cancel_event.is_set():
+                continue  # Drain without embedding so the producer never blocks
+            buffer.extend(item)
+            while len(buffer) >= self.batch_size:
+                emit(buffer[:self.batch_size])
+                buffer = buffer[self.batch_size:]
+
+        if buffer and not self.cancel_event.is_set():
+            emit(buffer)
+        for _ in range(self.upsert_workers):
+            upsert_queue.put(_DONE)
+
+    def _upsert_worker(self, upsert_queue: queue.Queue):
+        stage = self.stats["upsert"]
+        while True:
+            item = upsert_queue.get()
+            if item is _DONE:
+                break
+            chunks, embeddings = item
+            if self.cancel_event.is_set():
+                continue
+            try:
+                started = time.perf_counter()
+                self.vector_store.add_chunks(chunks, embeddings)
+                stage.record(len(chunks), time.perf_counter() - started)
+                with self._progress_lock:
+                    for c in chunks:
+                        self._outstanding[c.metadata["source"]] -= 1
+            except Exception as e:
+                print(f"✗ Upsert batch failed: {e}")
+                self._fail({c.metadata["source"] for c in chunks}, e)
+            self._report()
+
+    def _parser_pool(self):
+        """(executor, output queue, stop flag) for the parse stage."""
+        if self.parse_workers == 1:
+            output, stop = queue.Queue(maxsize=self.queue_size), threading.Event()
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-parse",
+                                          initializer=_init_parser, initargs=(output, stop))
+            return executor, output, stop
+        # Spawned workers only import the parsers, not the models loaded in this process
+        context = multiprocessing.get_context("spawn")
+        output, stop = context.Queue(maxsize=self.queue_size), context.Event()
+        executor = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context,
+                                       initializer=_init_parser, initargs=(output, stop))
+        return executor, output, stop
+
+    def _on_chunks(self, state: dict, batch: list, embed_queue: queue.Queue):
+        """Hash a parsed batch and queue the chunks that changed since the last build."""
+        previous = state["job"]["previous"]
+        changed = []
+        for chunk in batch:
+            state["current"][chunk.id] = self.text_hash(chunk.text)
+            if previous.get(chunk.id) != state["current"][chunk.id]:
+                changed.append(chunk)
+        if not changed:
+            return
+        filename = state["job"]["filename"]
+        state["changed"] += len(changed)
+        with self._progress_lock:
+            self._chunks_queued += len(changed)
+            self._outstanding[filename] = self._outstanding.get(filename, 0) + len(changed)
+        self._put(embed_queue, changed, self.stats["parse"])
+
+    def run(self, jobs: list[dict]) -> dict:
+        """Ingest documents and return their manifest entries.
+
+        Each job is a dict with "path", "filename", "doc_id", "hash" and
+        "previous" (chunk id -> text hash from the last build). Unchanged
+        chunks are skipped and stale ones deleted. Documents with any failed
+        batch, or not finished when the run was cancelled, are reported in
+        "failed" and left out of "documents", so the next build retries them.
+        """
+        started = time.perf_counter()
+        embed_queue = queue.Queue(maxsize=self.queue_size)
+        upsert_queue = queue.Queue(maxsize=self.queue_size)
+
+        embedder = threading.Thread(target=self._embed_worker, args=(embed_queue, upsert_queue),
+                                    name="ingest-embed", daemon=True)
+        upserters = [
+            threading.Thread(target=self._upsert_worker, args=(upsert_queue,), name=f"ingest-upsert-{i}", daemon=True)
+            for i in range(self.upsert_workers)
+        ]
+        embedder.start()
+        for t in upserters:
+            t.start()
+
+        documents = {}
+        stale = {}
+        self._files_total = len(jobs)
+        # Spare parser workers go to page-level extraction when there are fewer files than workers
+        pdf_workers = max(1, self.parse_workers // max(1, min(len(jobs), self.parse_workers)))
+        executor, output, stop = self._parser_pool()
+        try:
+            with executor:
+                pending = {}  # filename -> future
+                states = {}  # filename -> {"job", "current" chunk hashes, "changed" count}
+                remaining = list(jobs)
+                try:
+                    while remaining or pending:
+                        if self.cancel_event.is_set() and not stop.is_set():
+                            print("Build cancelled, dropping remaining documents")
+                            stop.set()
+                            remaining = []
+                            for future in pending.values():
+                                future.cancel()  # Not started yet; reported below
+                        # Keep a bounded number of files in flight
+                        while remaining and len(pending) < self.parse_workers * 2:
+                            job = remaining.pop(0)
+                            pending[job["filename"]] = executor.submit(
+                                parse_file, job["path"], job["doc_id"], job["filename"], self.batch_size, pdf_workers
+                            )
+                            states[job["filename"]] = {"job": job, "current": {}, "changed": 0}
+
+                        try:
+                            message = output.get(timeout=0.1)
+                        except queue.Empty:
+                            # A worker that died or was cancelled never reports back
+                            for filename, future in list(pending.items()):
+                                if future.cancelled() or (future.done() and future.exception() is not None):
+                                    error = "cancelled" if future.cancelled() else future.exception()
+                                    print(f"✗ Error parsing document {filename}: {error}")
+                                    self._fail([filename], error)
+                                    del pending[filename], states[filename]
+                            continue
+
+                        kind, filename = message[0], message[1]
+                        if filename not in states:
+                            continue  # Late output of a file already given up on
+                        if kind == "chunks":
+                            if not stop.is_set():
+                                self._on_chunks(states[filename], message[2], embed_queue)
+                            continue
+                        del pending[filename]
+                        state = states.pop(filename)
+                        if kind == "error":
+                            print(f"✗ Error parsing document {filename}: {message[2]}")
+                            self._fail([filename], message[2])
+                            continue
+
+                        job, current = state["job"], state["current"]
+                        self.stats["parse"].record(1, message[2])
+                        self.stats["parse"].blocked(message[3])
+                        stale[filename] = [chunk_id for chunk_id in job["previous"] if chunk_id not in current]
+                        documents[filename] = {"doc_id": job["doc_id"], "hash": job["hash"], "chunks": current}
+                        print(f"Parsed {filename}: {len(current)} chunks, {state['changed']} to embed")
+                        with self._progress_lock:
+                            self._files_done += 1
+                        self._report()
+                finally:
+                    if pending:
+                        # Stop the parsers and drain their output so none stays blocked on a full queue
+                        stop.set()
+                        while not all(future.done() for future in pending.values()):
+                            try:
+                                output.get(timeout=0.1)
+                            except queue.Empty:
+                                pass
+        finally:
+            embed_queue.put(_DONE)
+            embedder.join()
+            for t in upserters:
+                t.join()
+            if self._bulk is not None:
+                self._bulk.close()
+
+        embed_stats = self.stats["embed"].report()
+        mode = f"{self._bulk.workers} processes" if self._bulk is not None else "in-process"
+        print(f"✓ Embedded {embed_stats['items']} chunks at {embed_stats['items_per_second']} chunks/s ({mode})")
+
+        # Anything not fully upserted (cancelled or dropped) must be redone next build
+        for filename, outstanding in self._outstanding.items():
+            if outstanding > 0:
+                self._fail([filename], "cancelled" if self.cancel_event.is_set() else "incomplete")
+
+        # Stale chunks are removed only once their document's new chunks are in
+        chunks_deleted = 0
+        for filename, ids in stale.items():
+            if ids and filename not in self._failed:
+                self.vector_store.delete(ids)
+                chunks_deleted += len(ids)
+        self.vector_store.flush()
+
+        failed = dict(self._failed)
+        wall_seconds = time.perf_counter() - started
+        return {
+            "documents": {name: entry for name, entry in documents.items() if name not in failed},
+            "failed": failed,
+            "chunks_upserted": self.stats["upsert"].items,
+            "chunks_queued": self._chunks_queued,
+            "cancelled": self.cancel_event.is_set(),
+            "chunks_deleted": chunks_deleted,
+            "wall_seconds": round(wall_seconds, 3),
+            "embedding": {"mode": "bulk", **self._bulk.stats()} if self._bulk is not None else {
+                "mode": "in-process", "workers": 1, "chunks": embed_stats["items"],
+                "chunks_per_second": embed_stats["items_per_second"]
+            },
+            "stages": {name: stage.report() for name, stage in self.stats.items()}
+        }
@@ -1,64 +1,227 @@
 import os
-import uuid
 import json
-from backend.core.models import DocumentMeta
-from backend.parsers.docs_parser import parse_document
-from backend.parsers.text_chunker import chunk_text
-from backend.parsers.html_parser import parse_html
-from backend.core.vectorstore import PineconeVectorStore
+import hashlib
+import uuid
+import threading
+from backend.parsers.dom_digest import build_dom_digest
+from backend.core.vectorstore import create_vector_store
+from backend.core.lexical_index import with_lexical_index, get_lexical_index
+from backend.core.embeddings import get_embedding_model
+from backend.services.ingest_pipeline import IngestPipeline
+from backend.core.llm_cache import invalidate_llm_cache
+from backend.core.registry import registry
+from backend.core.config import settings
 
-# Global vector store instance
-_vector_store = None
+# Version of the indexed corpus as ((mtime_ns, size) of the manifest, version); None until first read
+_kb_version = None
+# In-process digest memo: html path -> (mtime_ns, size, digest)
+_digest_memo = {}
+# Held while a build or reset runs, so they never interleave
+_build_lock = threading.Lock()
+# Content hashes known without re-reading: path -> (mtime_ns, size, sha256)
+_hash_memo = {}
 
 DOC_PATH = "backend/data/docs/"
 HTML_PATH = "backend/data/html/ui_elements.json"
+MANIFEST_PATH = "backend/data/kb_manifest.json"
+DIGEST_DIR = "backend/data/cache/dom_digests/"
+HTML_DIR = "backend/data/html/"
+UPLOAD_TMP_DIR = "backend/data/uploads_tmp/"  # Partial uploads stay out of the directories builds scan
+
+def _create_vector_store():
+    print("Initializing vector store instance")
+    return with_lexical_index(create_vector_store())
 
 def get_vector_store():
-    """Get or create the Pinecone vector store instance."""
-    global _vector_store
-    if _vector_store is None:
-        print("Initializing Pinecone vector store instance")
-        _vector_store = PineconeVectorStore()
-    return _vector_store
+    """Get or create the configured vector store instance."""
+    return registry.get("vector_store", _create_vector_store)
 
 def reinitialize_vector_store():
-    """Force reinitialize the Pinecone vector store instance."""
-    global _vector_store
-    print("Reinitializing Pinecone vector store instance")
-    _vector_store = PineconeVectorStore()
-    return _vector_store
-
-def ingest_document(file_path: str) -> DocumentMeta:
-    filename = os.path.basename(file_path)
-    doc_id = str(uuid.uuid4())
-
-    print(f"Parsing document: {filename}")
-    text = parse_document(file_path)
-    
-    print(f"Chunking document: {filename}")
-    chunks = chunk_text(doc_id, text)
-    print(f"Created {len(chunks)} chunks from {filename}")
-    
-    # Get fresh vector store reference
-    vs = get_vector_store()
-    before_count = vs.count()
-    print(f"Vector store count before adding: {before_count}")
-    
-    vs.add_chunks(chunks)
-    
-    after_count = vs.count()
-    print(f"Vector store count after adding: {after_count}")
-    print(f"Added {after_count - before_count} embeddings")
+    """Force reinitialize the configured vector store instance."""
+    print("Reinitializing vector store instance")
+    return registry.replace(
+        "vector_store", lambda: with_lexical_index(create_vector_store()), dispose=lambda vs: vs.close()
+    )
+
+def file_hash(path: str) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    stat = os.stat(path)
+    memo = _hash_memo.get(path)
+    if memo is not None and memo[:2] == (stat.st_mtime_ns, stat.st_size):
+        return memo[2]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    _hash_memo[path] = (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+    return digest.hexdigest()
+
+class UploadTooLarge(Exception):
+    pass
+
+def _indexed_hash(dest_dir: str, filename: str):
+    """Content hash recorded for an upload target by the last build (documents) or UI index (HTML)."""
+    if dest_dir == DOC_PATH:
+        return load_manifest()["documents"].get(filename, {}).get("hash")
+    try:
+        with open(HTML_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    pages = data.get("pages", {}) if isinstance(data, dict) else {}
+    return pages.get(filename, {}).get("hash")
+
+class UploadWriter:
+    """Writes one uploaded file under a temporary name as it arrives, hashing it in the same pass.
+
+    `write` raises UploadTooLarge once the file exceeds `max_bytes`.
+    `commit` moves the complete file into `dest_dir` and remembers its hash
+    so the next build does not read it again; `abort` removes the partial
+    file, so nothing is left behind in the directories builds scan.
+    """
+
+    def __init__(self, dest_dir: str, filename: str, max_bytes: int):
+        filename = os.path.basename(filename or "")
+        if not filename or filename.startswith("."):
+            raise ValueError(f"Invalid file name: {filename!r}")
+        self.dest_dir = dest_dir
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+        self._tmp_path = os.path.join(UPLOAD_TMP_DIR, f"{uuid.uuid4().hex}.part")
+        self._file = open(self._tmp_path, "wb")
+
+    def write(self, block: bytes):
+        self.size += len(block)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise UploadTooLarge(f"{self.filename} exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+        self._digest.update(block)
+        self._file.write(block)
+
+    def close(self):
+        self._file.close()
+
+    def commit(self) -> dict:
+        """Move the file into place; reports its size, SHA-256 and whether it matches what was last indexed."""
+        self._file.close()
+        os.makedirs(self.dest_dir, exist_ok=True)
+        path = os.path.join(self.dest_dir, self.filename)
+        os.replace(self._tmp_path, path)
+        stat = os.stat(path)
+        sha256 = self._digest.hexdigest()
+        _hash_memo[path] = (stat.st_mtime_ns, stat.st_size, sha256)
+        return {
+            "filename": self.filename,
+            "bytes": self.size,
+            "sha256": sha256,
+            "unchanged": _indexed_hash(self.dest_dir, self.filename) == sha256
+        }
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def document_id(filename: str) -> str:
+    """Stable document id derived from the filename, used as the chunk id prefix."""
+    return hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16]
+
+def load_manifest() -> dict:
+    """Load the build manifest mapping each ingested file to its content and chunk hashes."""
+    if not os.path.exists(MANIFEST_PATH):
+        return {"documents": {}}
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: could not read build manifest, starting fresh: {e}")
+        return {"documents": {}}
+    manifest.setdefault("documents", {})
+    return manifest
+
+def manifest_version(manifest: dict) -> str:
+    """Hash of every indexed file's name and content hash; changes whenever the corpus does."""
+    entries = sorted((name, doc["hash"]) for name, doc in manifest["documents"].items())
+    return hashlib.sha256(json.dumps(entries).encode("utf-8")).hexdigest()[:16]
+
+def _manifest_signature():
+    try:
+        stat = os.stat(MANIFEST_PATH)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def save_manifest(manifest: dict):
+    global _kb_version
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+    _kb_version = (_manifest_signature(), manifest_version(manifest))
+
+def clear_manifest():
+    global _kb_version
+    if os.path.exists(MANIFEST_PATH):
+        os.remove(MANIFEST_PATH)
+    _kb_version = (None, manifest_version({"documents": {}}))
+
+def get_kb_version() -> str:
+    """Current knowledge-base version, used to scope caches to one corpus.
+
+    Re-read when the manifest file changes, so a build or reset in another
+    worker process is picked up here too.
+    """
+    global _kb_version
+    signature = _manifest_signature()
+    if _kb_version is None or _kb_version[0] != signature:
+        _kb_version = (signature, manifest_version(load_manifest()))
+    return _kb_version[1]
+
+def get_dom_digest(file_path: str) -> str:
+    """Return the compact DOM digest of an HTML file, building it once per file content.
+
+    Digests are stored under DIGEST_DIR by content hash; an in-process memo
+    keyed by mtime and size avoids re-hashing the file on every request.
+    """
+    stat = os.stat(file_path)
+    memo = _digest_memo.get(file_path)
+    if memo is not None and memo[:2] == (stat.st_mtime_ns, stat.st_size):
+        return memo[2]
 
-    return DocumentMeta(id=doc_id, filename=filename, doc_type=filename.split(".")[-1], path=file_path)
+    digest_path = os.path.join(DIGEST_DIR, f"{file_hash(file_path)}.txt")
+    if os.path.exists(digest_path):
+        with open(digest_path, "r", encoding="utf-8") as f:
+            digest = f.read()
+    else:
+        with open(file_path, "r", encoding="utf-8") as f:
+            html = f.read()
+        digest = build_dom_digest(html)
+        os.makedirs(DIGEST_DIR, exist_ok=True)
+        tmp_path = digest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(digest)
+        os.replace(tmp_path, digest_path)
+        print(f"✓ Built DOM digest for {os.path.basename(file_path)}: {len(html)} -> {len(digest)} chars")
+
+    _digest_memo[file_path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
 
 def ingest_html(file_path: str):
-    elements = parse_html(file_path)
-    with open(HTML_PATH, "w", encoding="utf-8") as f:
-        json.dump([e.dict() for e in elements], f, indent=2)
+    """Index the page's UI elements (persisted per page in HTML_PATH) and build its DOM digest."""
+    from backend.services.ui_index import get_ui_index
+    elements = get_ui_index().index_page(file_path)
+    get_dom_digest(file_path)
     return elements
 
 def get_kb_status():
+    from backend.services.ui_index import get_ui_index
     doc_files = os.listdir(DOC_PATH) if os.path.exists(DOC_PATH) else []
     html_files = os.listdir("backend/data/html/") if os.path.exists("backend/data/html/") else []
     
@@ -70,41 +233,130 @@ def get_kb_status():
         "doc_count": len(doc_files),
         "doc_files": doc_files,
         "html_parsed": os.path.exists(HTML_PATH),
+        "ui_pages": get_ui_index().pages(),
         "html_files": [f for f in html_files if f.endswith(".html") or f.endswith(".htm")],
-        "embedding_count": embedding_count
+        "embedding_count": embedding_count,
+        "lexical_count": get_lexical_index().count() if settings.LEXICAL_INDEX_ENABLED else None
     }
 
-def build_knowledge_base():
+def knowledge_base_busy() -> bool:
+    """True while a build or reset holds the knowledge base."""
+    return _build_lock.locked()
+
+def build_knowledge_base(on_progress=None, cancel_event: threading.Event = None):
+    """Build the knowledge base; only one build or reset runs at a time.
+
+    `on_progress` receives the ingestion pipeline's progress dict, and
+    setting `cancel_event` stops the build after the batches in flight.
+    """
+    if not _build_lock.acquire(blocking=False):
+        return {"status": "busy", "error": "A knowledge base build or reset is already running"}
+    try:
+        return _build_knowledge_base(on_progress, cancel_event)
+    finally:
+        _build_lock.release()
+
+def _build_knowledge_base(on_progress=None, cancel_event: threading.Event = None):
     try:
         print("\n" + "="*70)
         print("BUILDING KNOWLEDGE BASE")
         print("="*70)
         
         doc_count = 0
+        skipped_count = 0
         html_count = 0
+        stats = {"chunks_upserted": 0, "chunks_deleted": 0}
         
         # Get vector store and check initial state
         vs = get_vector_store()
         initial_count = vs.count()
         print(f"Initial embedding count: {initial_count}")
         
+        manifest = load_manifest()
+        if initial_count == 0 and manifest["documents"]:
+            if vs.count_known():
+                # The store was emptied behind our back; the manifest no longer describes it
+                print("Vector store is empty, discarding stale build manifest")
+                manifest = {"documents": {}}
+            else:
+                # A failed stats request must not force re-embedding the whole corpus
+                print("⚠️ Vector count unavailable, keeping the build manifest")
+        
+        lexical = get_lexical_index() if settings.LEXICAL_INDEX_ENABLED else None
+        
         # Ingest Docs
+        doc_files = os.listdir(DOC_PATH) if os.path.exists(DOC_PATH) else []
+        pipeline_stats = None
         if os.path.exists(DOC_PATH):
-            doc_files = os.listdir(DOC_PATH)
             print(f"\nFound {len(doc_files)} documents to process")
+            jobs = []
             for f in doc_files:
-                try:
-                    print(f"\n--- Processing document: {f} ---")
-                    doc_meta = ingest_document(os.path.join(DOC_PATH, f))
-                    print(f"✓ Successfully ingested {f} (ID: {doc_meta.id})")
-                    doc_count += 1
-                except Exception as e:
-                    print(f"✗ Error processing document {f}: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
+                path = os.path.join(DOC_PATH, f)
+                content_hash = file_hash(path)
+                entry = manifest["documents"].get(f, {})
+                previous = entry.get("chunks", {})
+                if entry.get("hash") == content_hash:
+                    if lexical is None or not previous or lexical.has_document(document_id(f)):
+                        print(f"--- Skipping unchanged document: {f} ---")
+                        skipped_count += 1
+                        continue
+                    # Indexed before the lexical index existed: upsert every chunk again to fill it
+                    print(f"--- Adding unchanged document to the lexical index: {f} ---")
+                    previous = dict.fromkeys(previous)
+                jobs.append({
+                    "path": path,
+                    "filename": f,
+                    "doc_id": document_id(f),
+                    "hash": content_hash,
+                    "previous": previous
+                })
+            
+            if jobs:
+                print(f"\n--- Ingesting {len(jobs)} documents ---")
+                pipeline = IngestPipeline(
+                    vs, get_embedding_model(), text_hash, on_progress=on_progress, cancel_event=cancel_event
+                )
+                result = pipeline.run(jobs)
+                manifest["documents"].update(result["documents"])
+                for f, error in result["failed"].items():
+                    print(f"✗ Error processing document {f}: {error}")
+                doc_count = len(result["documents"])
+                stats["chunks_upserted"] += result["chunks_upserted"]
+                stats["chunks_deleted"] += result["chunks_deleted"]
+                pipeline_stats = {k: result[k] for k in ("wall_seconds", "stages", "failed")}
+                for name, stage in result["stages"].items():
+                    print(f"{name}: {stage['items']} items in {stage['busy_seconds']}s busy "
+                          f"({stage['items_per_second']}/s), {stage['blocked_seconds']}s blocked")
         else:
             print("\nNo documents directory found")
         
+        # Drop vectors of documents that were removed since the last build
+        for f in [name for name in manifest["documents"] if name not in doc_files]:
+            stale_ids = list(manifest["documents"][f].get("chunks", {}))
+            print(f"\n--- Removing deleted document: {f} ({len(stale_ids)} chunks) ---")
+            vs.delete(stale_ids)
+            stats["chunks_deleted"] += len(stale_ids)
+            del manifest["documents"][f]
+        vs.flush()
+        
+        save_manifest(manifest)
+        
+        # Cached completions were grounded in the previous knowledge base
+        if doc_count > 0 or stats["chunks_deleted"] > 0:
+            invalidate_llm_cache()
+        
+        if cancel_event is not None and cancel_event.is_set():
+            print("⚠️ Build cancelled; finished documents were kept, the rest will be rebuilt next time")
+            return {
+                "status": "cancelled",
+                "documents_processed": doc_count,
+                "documents_skipped": skipped_count,
+                "embedding_count": vs.count(),
+                "chunks_upserted": stats["chunks_upserted"],
+                "chunks_deleted": stats["chunks_deleted"],
+                "pipeline": pipeline_stats
+            }
+        
         # Ingest HTML
         html_dir = "backend/data/html/"
         if os.path.exists(html_dir):
@@ -131,18 +383,22 @@ def build_knowledge_base():
         print("BUILD SUMMARY")
         print("="*70)
         print(f"Documents processed: {doc_count}")
+        print(f"Documents unchanged (skipped): {skipped_count}")
         print(f"HTML files processed: {html_count}")
+        print(f"Chunks upserted: {stats['chunks_upserted']}")
+        print(f"Chunks deleted: {stats['chunks_deleted']}")
         print(f"Initial embeddings: {initial_count}")
         print(f"Final embeddings: {final_count}")
         print(f"Embeddings added: {embeddings_added}")
         print("="*70 + "\n")
         
         # Check if build was successful
-        if doc_count > 0 and embeddings_added == 0:
+        if doc_count > 0 and final_count == 0:
             print("⚠️ WARNING: Documents were processed but no embeddings were added!")
             return {
                 "status": "warning",
                 "documents_processed": doc_count,
+                "documents_skipped": skipped_count,
                 "html_processed": html_count,
                 "embedding_count": final_count,
                 "warning": "Documents processed but no embeddings created"
@@ -151,9 +407,13 @@ def build_knowledge_base():
         return {
             "status": "built",
             "documents_processed": doc_count,
+            "documents_skipped": skipped_count,
             "html_processed": html_count,
             "embedding_count": final_count,
-            "embeddings_added": embeddings_added
+            "embeddings_added": embeddings_added,
+            "chunks_upserted": stats["chunks_upserted"],
+            "chunks_deleted": stats["chunks_deleted"],
+            "pipeline": pipeline_stats
         }
     except Exception as e:
         print(f"\n❌ ERROR building knowledge base: {str(e)}")
@@ -165,6 +425,14 @@ def build_knowledge_base():
         }
 
 def reset_knowledge_base():
+    if not _build_lock.acquire(blocking=False):
+        return {"status": "busy", "error": "A knowledge base build or reset is already running"}
+    try:
+        return _reset_knowledge_base()
+    finally:
+        _build_lock.release()
+
+def _reset_knowledge_base():
     print("\n" + "="*70)
     print("RESETTING KNOWLEDGE BASE")
     print("="*70)
@@ -186,11 +454,20 @@ def reset_knowledge_base():
             for f in html_files:
                 os.remove(os.path.join(html_dir, f))
             print("✓ HTML files removed")
+        if os.path.exists(DIGEST_DIR):
+            for f in os.listdir(DIGEST_DIR):
+                os.remove(os.path.join(DIGEST_DIR, f))
+            _digest_memo.clear()
+            print("✓ DOM digests removed")
+        from backend.services.ui_index import get_ui_index
+        get_ui_index().clear()
     
         # Reset Vector DB
         print("\nResetting vector database...")
         vs = get_vector_store()
         vs.reset()
+        clear_manifest()
+        invalidate_llm_cache()
         
         # Reinitialize the vector store instance to get a fresh reference
         print("Reinitializing vector store instance...")
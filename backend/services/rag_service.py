@@ -1,31 +1,157 @@
+import time
 from backend.core.models import Chunk
+from backend.core.config import settings
+from backend.core.prompt_budget import PromptSection, assemble_prompt
+from backend.core.embeddings import get_embedding_model
+from backend.core.lexical_index import get_lexical_index, tokenize
 from backend.services.kb_service import get_vector_store
 
-def retrieve_context(query: str, top_k=8) -> list[Chunk]:
-    # Get the current vector store instance
-    vector_store = get_vector_store()
-    results = vector_store.query(query, top_k)
+RETRIEVAL_MODES = ("dense", "hybrid", "auto")
+
+def _results_to_chunks(results: dict, query_index: int) -> list[Chunk]:
     chunks = []
-    # Check if results exist and have documents
-    if results and "documents" in results and results["documents"]:
+    # Check if results exist and have documents for this query
+    if results and "documents" in results and len(results["documents"]) > query_index:
         # results["documents"] is a list of lists (one list per query)
-        # We only queried one text, so we take the first list
-        for i in range(len(results["documents"][0])):
+        for i in range(len(results["documents"][query_index])):
+            metadata = dict(results["metadatas"][query_index][i])
+            metadata["score"] = 1 - results["distances"][query_index][i]  # Similarity, used to rank context
             chunks.append(
                 Chunk(
-                    id=results["ids"][0][i],
+                    id=results["ids"][query_index][i],
                     doc_id="unknown",  # metadata can be expanded later
-                    text=results["documents"][0][i],
-                    metadata=results["metadatas"][0][i]
+                    text=results["documents"][query_index][i],
+                    metadata=metadata
                 )
             )
     return chunks
 
-def build_testcase_prompt(query: str, chunks: list[Chunk]) -> str:
-    context_str = "\n".join(
-        [f"[CHUNK {c.metadata.get('chunk_index')}] {c.text}" for c in chunks]
+def _lexical_chunks(hits: list[dict]) -> list[Chunk]:
+    top = hits[0]["score"] if hits else 0.0
+    return [
+        Chunk(id=h["id"], doc_id=h["doc_id"], text=h["text"],
+              metadata={**h["metadata"], "score": h["score"] / top if top else 0.0})  # BM25 relative to the best hit
+        for h in hits
+    ]
+
+def fuse_rankings(rankings: list[list[Chunk]], top_k: int, k: int = None) -> list[Chunk]:
+    """Reciprocal rank fusion: a chunk scores sum(1 / (k + rank)) over the rankings it appears in.
+
+    Only ranks are used, so BM25 and cosine scores never need to be put on
+    the same scale. The fused score (relative to the best) replaces "score".
+    """
+    k = settings.HYBRID_RRF_K if k is None else k
+    scores, chunks = {}, {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, 1):
+            scores[chunk.id] = scores.get(chunk.id, 0.0) + 1 / (k + rank)
+            chunks.setdefault(chunk.id, chunk)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    top = scores[best[0]] if best else 0.0
+    return [
+        Chunk(id=c.id, doc_id=c.doc_id, text=c.text, metadata={**c.metadata, "score": scores[c.id] / top})
+        for c in (chunks[chunk_id] for chunk_id in best)
+    ]
+
+def is_exact_term_query(query: str) -> bool:
+    """Short queries such as field names or codes ("promo code", "SAVE15") that BM25 can answer alone."""
+    return 0 < len(set(tokenize(query))) <= settings.LEXICAL_FAST_PATH_MAX_TERMS
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+def retrieve_context(query: str, top_k=8, mode: str = None, timings: list = None) -> list[Chunk]:
+    return retrieve_context_batch([query], top_k, mode, timings)[0]
+
+def retrieve_context_batch(queries: list[str], top_k=8, mode: str = None, timings: list = None) -> list[list[Chunk]]:
+    """Retrieve context for several queries; dense searches share one embedding pass.
+
+    `mode` (default RETRIEVAL_MODE): "dense" searches the vector store only;
+    "hybrid" also searches the BM25 index and fuses both rankings; "auto"
+    answers short exact-term queries from the BM25 index alone when a chunk
+    contains every query term, skipping the embedding model and the vector
+    store, and runs hybrid for the rest. Without a lexical index every mode
+    falls back to dense.
+
+    Returns one list of chunks per query, in the same order as `queries`.
+    When `timings` is given, a latency breakdown per query is appended to it:
+    the path taken and lexical_ms, embed_ms, dense_ms, fuse_ms and total_ms
+    (None for steps that did not run; embed_ms and dense_ms cover the whole
+    batch of dense queries).
+    """
+    if not queries:
+        return []
+    mode = (mode or settings.RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode} (expected one of {', '.join(RETRIEVAL_MODES)})")
+
+    lexical = get_lexical_index() if mode != "dense" and settings.LEXICAL_INDEX_ENABLED else None
+    if lexical is not None and lexical.count() == 0:
+        lexical = None  # Nothing indexed yet, e.g. before the first build with the lexical index
+    candidates = max(top_k, settings.HYBRID_CANDIDATES) if lexical is not None else top_k
+
+    contexts = [None] * len(queries)
+    hits = [None] * len(queries)
+    breakdowns = [
+        {"path": "dense", "lexical_ms": None, "embed_ms": None, "dense_ms": None, "fuse_ms": None}
+        for _ in queries
+    ]
+
+    if lexical is not None:
+        for i, query in enumerate(queries):
+            started = time.perf_counter()
+            hits[i] = lexical.search(query, candidates)
+            breakdowns[i]["lexical_ms"] = _ms(started)
+            if mode == "auto" and hits[i] and hits[i][0]["coverage"] == 1.0 and is_exact_term_query(query):
+                contexts[i] = _lexical_chunks(hits[i][:top_k])
+                breakdowns[i]["path"] = "lexical"
+
+    pending = [i for i, context in enumerate(contexts) if context is None]
+    if pending:
+        # Get the current vector store instance
+        vector_store = get_vector_store()
+        pending_queries = [queries[i] for i in pending]
+        started = time.perf_counter()
+        embeddings = get_embedding_model().encode_queries(pending_queries)
+        embed_ms = _ms(started)
+        started = time.perf_counter()
+        results = vector_store.query_batch(pending_queries, candidates, embeddings=embeddings)
+        dense_ms = _ms(started)
+
+        for n, i in enumerate(pending):
+            dense = _results_to_chunks(results, n)
+            breakdowns[i].update(embed_ms=embed_ms, dense_ms=dense_ms)
+            if hits[i] is None:
+                contexts[i] = dense[:top_k]
+                continue
+            started = time.perf_counter()
+            contexts[i] = fuse_rankings([dense, _lexical_chunks(hits[i])], top_k)
+            breakdowns[i].update(path="hybrid", fuse_ms=_ms(started))
+
+    if timings is not None:
+        for breakdown in breakdowns:
+            breakdown["total_ms"] = round(sum(v for k, v in breakdown.items() if k != "path" and v is not None), 2)
+            timings.append(breakdown)
+    return contexts
+
+def _page_label(chunk: Chunk) -> str:
+    page = chunk.metadata.get("page")
+    if page is None:
+        return ""
+    page_end = chunk.metadata.get("page_end")
+    return f", p. {int(page)}-{int(page_end)}" if page_end else f", p. {int(page)}"
+
+def context_section(chunks: list[Chunk], weight: float = None) -> PromptSection:
+    """Retrieved chunks as a prompt section ranked by retrieval similarity."""
+    return PromptSection(
+        "context",
+        [f"[CHUNK {c.metadata.get('chunk_index')}{_page_label(c)}] {c.text}" for c in chunks],
+        scores=[c.metadata.get("score", 0.0) for c in chunks],
+        weight=settings.PROMPT_WEIGHT_CONTEXT if weight is None else weight
     )
 
+def build_testcase_prompt(query: str, chunks: list[Chunk]):
+    """Build the test case prompt within the token budget; returns (prompt, token_counts)."""
     schema = """
 Output MUST be a JSON array.
 Each object MUST contain:
@@ -40,14 +166,15 @@ Each object MUST contain:
 - grounded_in (array of document or chunk references)
 """
 
-    return f"""
+    def render(sections: dict) -> str:
+        return f"""
 SYSTEM:
 You are a QA test designer. You MUST base all test cases ONLY on the provided context.
 If something is not specified, respond "Not defined in provided documentation".
 Output MUST be valid JSON.
 
 CONTEXT:
-{context_str}
+{sections["context"]}
 
 USER REQUEST:
 {query}
@@ -55,3 +182,5 @@ USER REQUEST:
 REQUIRED OUTPUT FORMAT:
 {schema}
 """
+
+    return assemble_prompt(render, [context_section(chunks)])
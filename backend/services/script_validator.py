@@ -0,0 +1,195 @@
+import ast
+import os
+import re
+import threading
+from backend.services.kb_service import get_dom_digest, HTML_DIR
+from backend.services.ui_index import get_ui_index
+
+# Selenium's By constants and the strategy strings they stand for
+BY_STRATEGIES = {
+    "ID": "id",
+    "NAME": "name",
+    "CSS_SELECTOR": "css selector",
+    "XPATH": "xpath",
+    "TAG_NAME": "tag name",
+    "CLASS_NAME": "class name",
+    "LINK_TEXT": "link text",
+    "PARTIAL_LINK_TEXT": "partial link text"
+}
+# Selenium 3 style find_element_by_<suffix> methods
+LEGACY_FINDERS = {
+    "id": "id", "name": "name", "css_selector": "css selector", "xpath": "xpath",
+    "tag_name": "tag name", "class_name": "class name",
+    "link_text": "link text", "partial_link_text": "partial link text"
+}
+FIND_METHODS = {"find_element", "find_elements"}
+
+CSS_ID = re.compile(r"^(?:[a-zA-Z][\w-]*)?#([\w-]+)$")
+CSS_NAME = re.compile(r"""^([a-zA-Z][\w-]*)?\[name\s*=\s*["']?([^"'\]]+)["']?\]((?:\[[^\]]+\])*)$""")
+CSS_TAG = re.compile(r"^[a-zA-Z][\w-]*$")
+XPATH_ATTR = re.compile(r"""^//([\w*-]+)\[@(id|name)\s*=\s*["']([^"']+)["']\]$""")
+# The selector field of a digest line ("input[text] #email ...", "message #total ..."), not ids in visible text
+DIGEST_ID = re.compile(r"^\s*\S+ #([^\s\"]+)(?=\s|$)", re.M)
+
+# Selector indexes by page, rebuilt when the page's content hash changes
+_selector_indexes = {}
+_selector_lock = threading.Lock()
+
+class SelectorIndex:
+    """Hash lookups of a page's ids, names, tags and exact selectors with match counts."""
+
+    def __init__(self, elements: list, page_ids: set = ()):
+        self.ids, self.names, self.tags, self.selectors = {}, {}, {}, {}
+        for e in elements:
+            if e.html_id:
+                self.ids[e.html_id] = self.ids.get(e.html_id, 0) + 1
+            if e.name:
+                self.names[e.name] = self.names.get(e.name, 0) + 1
+            self.tags[e.tag] = self.tags.get(e.tag, 0) + 1
+            self.selectors[e.selector] = self.selectors.get(e.selector, 0) + 1
+        # Ids of non-form elements (messages, totals, ...) seen in the page's DOM digest
+        self.page_ids = set(page_ids) - set(self.ids)
+
+    def check(self, strategy: str, value: str):
+        """Return ("found" | "missing" | "ambiguous" | "unverified", match count)."""
+        if strategy == "css selector":
+            value = value.strip()
+            if value in self.selectors:
+                return self._count(self.selectors[value])
+            match = CSS_ID.match(value)
+            if match:
+                strategy, value = "id", match.group(1)
+            else:
+                match = CSS_NAME.match(value)
+                if match:
+                    status, count = self._lookup("name", match.group(2))
+                    # An extra qualifier such as [value="express"] picks one of a group
+                    return ("found", 1) if status == "ambiguous" and match.group(3) else (status, count)
+                if CSS_TAG.match(value):
+                    strategy = "tag name"
+                else:
+                    return "unverified", 0
+        elif strategy == "xpath":
+            match = XPATH_ATTR.match(value.strip())
+            if not match:
+                return "unverified", 0
+            strategy, value = match.group(2), match.group(3)
+        return self._lookup(strategy, value)
+
+    def _lookup(self, strategy: str, value: str):
+        if strategy == "id":
+            if value not in self.ids and value in self.page_ids:
+                return "found", 1
+            return self._count(self.ids.get(value, 0))
+        if strategy == "name":
+            return self._count(self.names.get(value, 0))
+        if strategy == "tag name":
+            return self._count(self.tags.get(value.lower(), 0))
+        # Class names and link texts aren't part of the UI element store
+        return "unverified", 0
+
+    @staticmethod
+    def _count(count: int):
+        if count == 0:
+            return "missing", 0
+        return ("found" if count == 1 else "ambiguous"), count
+
+def get_selector_index(page: str = None):
+    """(page name, SelectorIndex) for `page`, cached until the page's content changes."""
+    entry = get_ui_index().page_entry(page)
+    if entry is None:
+        return None, None
+    with _selector_lock:
+        cached = _selector_indexes.get(entry.page)
+        if cached is not None and cached[0] == entry.hash:
+            return entry.page, cached[1]
+    try:
+        page_ids = set(DIGEST_ID.findall(get_dom_digest(os.path.join(HTML_DIR, entry.page))))
+    except OSError:
+        page_ids = set()
+    index = SelectorIndex(entry.elements, page_ids)
+    with _selector_lock:
+        _selector_indexes[entry.page] = (entry.hash, index)
+    return entry.page, index
+
+def _strategy(node: ast.AST):
+    """Strategy string of a `By.X` attribute or a literal like "css selector"."""
+    if isinstance(node, ast.Attribute) and node.attr in BY_STRATEGIES:
+        return BY_STRATEGIES[node.attr]
+    if isinstance(node, ast.Constant) and node.value in BY_STRATEGIES.values():
+        return node.value
+    return None
+
+def _call_name(node: ast.Call) -> str:
+    func = node.func
+    return func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else ""
+
+def extract_locators(tree: ast.AST) -> list[tuple]:
+    """(line, strategy, value node, plural) for every locator in a parsed script.
+
+    Covers driver.find_element(s)(By.X, value), legacy
+    find_element(s)_by_x(value) calls and (By.X, value) tuples, which is
+    how expected_conditions and locator constants are written. `plural` is
+    True for find_elements(...) and *_all_elements_* conditions, where
+    several matches are expected.
+    """
+    # Locator tuples passed to conditions such as presence_of_all_elements_located
+    plural_tuples = {
+        id(arg) for node in ast.walk(tree)
+        if isinstance(node, ast.Call) and "all_elements" in _call_name(node)
+        for arg in node.args if isinstance(arg, ast.Tuple)
+    }
+    locators = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            method = node.func.attr
+            if method in FIND_METHODS and len(node.args) >= 2:
+                strategy = _strategy(node.args[0])
+                if strategy:
+                    locators.append((node.lineno, strategy, node.args[1], method == "find_elements"))
+            elif method.startswith("find_element_by_") or method.startswith("find_elements_by_"):
+                suffix = method.split("_by_", 1)[1]
+                if suffix in LEGACY_FINDERS and node.args:
+                    locators.append((node.lineno, LEGACY_FINDERS[suffix], node.args[0],
+                                     method.startswith("find_elements_by_")))
+        elif isinstance(node, ast.Tuple) and len(node.elts) == 2:
+            strategy = _strategy(node.elts[0])
+            if strategy and isinstance(node.elts[0], ast.Attribute):
+                locators.append((node.lineno, strategy, node.elts[1], id(node) in plural_tuples))
+    return sorted(locators, key=lambda l: l[0])
+
+def validate_script(script: str, index: SelectorIndex) -> dict:
+    """Check every locator of a generated script against the page's selector index."""
+    report = {"valid": True, "locators": 0, "missing": [], "ambiguous": [], "unverified": []}
+    try:
+        tree = ast.parse(script)
+    except SyntaxError as e:
+        report.update(valid=False, syntax_error=f"line {e.lineno}: {e.msg}")
+        return report
+
+    for line, strategy, value_node, plural in extract_locators(tree):
+        report["locators"] += 1
+        if not (isinstance(value_node, ast.Constant) and isinstance(value_node.value, str)):
+            # Built at runtime (variable, f-string, concatenation); can't check statically
+            report["unverified"].append({"line": line, "strategy": strategy, "value": ast.unparse(value_node)})
+            continue
+        value = value_node.value
+        status, count = index.check(strategy, value)
+        if status == "ambiguous" and plural:
+            status = "found"  # find_elements expects several matches
+        if status == "missing":
+            report["missing"].append({"line": line, "strategy": strategy, "value": value})
+        elif status == "ambiguous":
+            report["ambiguous"].append({"line": line, "strategy": strategy, "value": value, "matches": count})
+        elif status == "unverified":
+            report["unverified"].append({"line": line, "strategy": strategy, "value": value})
+
+    report["valid"] = not report["missing"]
+    return report
+
+def validate_scripts(scripts: list[str], page: str = None) -> dict:
+    """Validate many scripts against one page's selector index."""
+    page, index = get_selector_index(page)
+    if index is None:
+        return {"page": None, "error": "No HTML page indexed yet", "results": []}
+    return {"page": page, "results": [validate_script(script, index) for script in scripts]}
@@ -1,47 +1,72 @@
 import json
 import os
-from backend.services.rag_service import retrieve_context
-from backend.core.llm_client import LLMClient
+import asyncio
+from backend.services.rag_service import retrieve_context_batch
+from backend.services.kb_service import get_dom_digest, HTML_DIR
+from backend.services.ui_index import get_ui_index
+from backend.services.script_validator import validate_scripts
+from backend.core.llm_client import get_llm_client, get_async_llm_client
 from backend.core.models import UIElement
+from backend.core.config import settings
+from backend.core.prompt_budget import PromptSection, assemble_prompt, relevance_scores
 
-llm = LLMClient()
+def load_ui_elements(page: str = None) -> list[UIElement]:
+    """UI elements of `page` (default page when None) from the in-memory index."""
+    return get_ui_index().elements(page)
 
-HTML_PATH = "backend/data/html/checkout.html"
-UI_PATH = "backend/data/html/ui_elements.json"
-
-def load_ui_elements() -> list[UIElement]:
-    if not os.path.exists(UI_PATH):
-        return []
-
-    import json
-    with open(UI_PATH, "r", encoding="utf-8") as f:
-        raw = json.load(f)
-
-    return [UIElement(**r) for r in raw]
-
-def load_html():
-    if not os.path.exists(HTML_PATH):
+def load_page_digest(page: str = None):
+    """Compact DOM digest of the page under test (built once per file content)."""
+    page = get_ui_index().resolve_page(page)
+    if page is None:
         return "No HTML uploaded yet."
-    with open(HTML_PATH, "r", encoding="utf-8") as f:
-        return f.read()
-
-def build_prompt(testcase: dict):
-    ui_elements = load_ui_elements()
-    html = load_html()
+    return get_dom_digest(os.path.join(HTML_DIR, page))
 
-    # Retrieve related documentation context based on test scenario text
-    context_chunks = retrieve_context(testcase.get("scenario", ""), top_k=5)
+def build_prompt(testcase: dict, page: str = None):
+    """Returns (prompt, token_counts) for one test case."""
+    return build_prompts([testcase], page)[0]
 
-    ui_table = "\\n".join(
-        [
-            f"{e.tag} | {e.element_type} | name={e.name} | id={e.html_id} | selector={e.selector}"
-            for e in ui_elements
-        ]
-    )
+def build_prompts(testcases: list[dict], page: str = None) -> list[tuple]:
+    """Build (prompt, token_counts) for several test cases against one page, with one retrieval pass."""
+    ui_elements = load_ui_elements(page)
+    html = load_page_digest(page)
 
-    context_text = "\\n".join([c.text for c in context_chunks])
+    ui_rows = [
+        f"{e.tag} | {e.element_type} | name={e.name} | id={e.html_id} | selector={e.selector}"
+        for e in ui_elements
+    ]
 
-    return f"""
+    # Retrieve related documentation context based on test scenario text
+    contexts = retrieve_context_batch([tc.get("scenario", "") for tc in testcases], top_k=5)
+
+    return [
+        render_prompt(testcase, context_chunks, html, ui_rows)
+        for testcase, context_chunks in zip(testcases, contexts)
+    ]
+
+def render_prompt(testcase: dict, context_chunks: list, html: str, ui_rows: list[str]):
+    """Fit context, page digest, UI table and test case into the token budget, keeping the most relevant parts."""
+    testcase_json = json.dumps(testcase, indent=2)
+    html_lines = html.splitlines()
+
+    sections = [
+        PromptSection(
+            "context", [c.text for c in context_chunks],
+            scores=[c.metadata.get("score", 0.0) for c in context_chunks],
+            weight=settings.PROMPT_WEIGHT_CONTEXT
+        ),
+        PromptSection(
+            "html", html_lines, scores=relevance_scores(html_lines, testcase_json),
+            weight=settings.PROMPT_WEIGHT_HTML
+        ),
+        PromptSection(
+            "ui_table", ui_rows, scores=relevance_scores(ui_rows, testcase_json),
+            weight=settings.PROMPT_WEIGHT_UI_TABLE
+        ),
+        PromptSection("testcase", [testcase_json], weight=settings.PROMPT_WEIGHT_TESTCASE)
+    ]
+
+    def render(parts: dict) -> str:
+        return f"""
 SYSTEM:
 You are a Selenium (Python) automation expert. Generate a COMPLETE, RUNNABLE Python test script.
 
@@ -50,21 +75,21 @@ CRITICAL REQUIREMENTS:
 2. Use the EXACT selectors from the UI ELEMENT TABLE below
 3. Include proper waits and error handling
 4. Add meaningful assertions based on expected behavior
-5. If an element is not in the UI table, check the HTML structure or add a TODO comment
+5. If an element is not in the UI table, check the PAGE STRUCTURE or add a TODO comment
 6. Use file:// protocol for local HTML files (e.g., "file:///path/to/checkout.html")
 7. Include comments explaining each step
 
 CONTEXT DOCUMENTATION:
-{context_text}
+{parts["context"]}
 
-FULL HTML STRUCTURE:
-{html}
+PAGE STRUCTURE (one element per line: kind, selector, label/text, state; "message" = result/error containers):
+{parts["html"]}
 
 UI ELEMENT TABLE (These are the parsed form elements):
-{ui_table}
+{parts["ui_table"]}
 
 TEST CASE TO IMPLEMENT:
-{json.dumps(testcase, indent=2)}
+{parts["testcase"]}
 
 REQUIRED OUTPUT FORMAT:
 Generate a complete Python script with:
@@ -106,10 +131,56 @@ IMPORTANT:
 - Make it immediately executable
 """
 
-def generate_selenium_script(testcase: dict):
-    prompt = build_prompt(testcase)
-    raw_response = llm.generate(prompt)
-    
+    return assemble_prompt(render, sections)
+
+def generate_selenium_script(testcase: dict, use_cache: bool = True, page: str = None) -> dict:
+    prompt, prompt_tokens = build_prompt(testcase, page)
+    raw_response = get_llm_client().generate(prompt, use_cache=use_cache)
+    return {"script": clean_script(raw_response), "prompt_tokens": prompt_tokens}
+
+async def generate_selenium_script_async(testcase: dict, use_cache: bool = True, page: str = None) -> dict:
+    prompt, prompt_tokens = await asyncio.to_thread(build_prompt, testcase, page)
+    raw_response = await get_async_llm_client().generate(prompt, use_cache=use_cache)
+    return {"script": clean_script(raw_response), "prompt_tokens": prompt_tokens}
+
+async def generate_selenium_scripts(testcases: list[dict], max_concurrency: int = None, use_cache: bool = True,
+                                    page: str = None):
+    """Generate scripts for many test cases, yielding each result as soon as it completes.
+
+    Prompts are built in one pass; LLM calls run concurrently with at most
+    `max_concurrency` (capped by LLM_MAX_CONCURRENCY) requests in flight.
+    """
+    limit = settings.LLM_MAX_CONCURRENCY
+    if max_concurrency:
+        limit = max(1, min(max_concurrency, limit))
+
+    prompts = await asyncio.to_thread(build_prompts, testcases, page)
+    llm = get_async_llm_client()
+    semaphore = asyncio.Semaphore(limit)
+
+    async def generate_one(i: int, prompt: str, prompt_tokens: dict):
+        result = {"index": i, "test_id": testcases[i].get("test_id"), "prompt_tokens": prompt_tokens}
+        async with semaphore:
+            try:
+                result["script"] = clean_script(await llm.generate(prompt, use_cache=use_cache))
+            except Exception as e:
+                print(f"Error generating script for {result['test_id']}: {e}")
+                result["error"] = str(e)
+        return result
+
+    tasks = [
+        asyncio.create_task(generate_one(i, prompt, prompt_tokens))
+        for i, (prompt, prompt_tokens) in enumerate(prompts)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Drop pending calls if the consumer went away early
+        for task in tasks:
+            task.cancel()
+
+def clean_script(raw_response: str) -> str:
     # Clean up markdown
     clean_response = raw_response.strip()
     if clean_response.startswith("```python"):
@@ -122,14 +193,9 @@ def generate_selenium_script(testcase: dict):
         
     return clean_response.strip()
 
-def validate_script_against_ui(script: str):
-    ui_elements = load_ui_elements()
-    selectors = [e.selector for e in ui_elements]
-
-    missing = []
-    for line in script.split("\\n"):
-        if "find_element" in line:
-            if not any(sel in line for sel in selectors):
-                missing.append(line)
-
-    return missing
+def validate_script_against_ui(script: str, page: str = None) -> dict:
+    """Locator report for one generated script (see script_validator)."""
+    batch = validate_scripts([script], page)
+    if not batch["results"]:
+        return {"valid": False, "error": batch["error"]}
+    return {"page": batch["page"], **batch["results"][0]}
@@ -0,0 +1,113 @@
+import time
+import threading
+import numpy as np
+from backend.core.config import settings
+from backend.core.embeddings import get_embedding_model
+from backend.core.registry import registry
+from backend.services.kb_service import get_kb_version
+
+class SemanticCache:
+    """Reuses test case results for queries that mean the same thing.
+
+    Incoming queries are embedded with the knowledge-base embedding model
+    and compared by cosine similarity against earlier queries made against
+    the same knowledge-base version. Entries from older versions are dropped
+    as soon as the version changes.
+    """
+
+    def __init__(self, threshold: float, max_entries: int):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._kb_version = None
+        self._queries = []
+        self._results = []
+        self._latencies = []
+        self._embeddings = np.empty((0, 0), dtype=np.float32)
+
+        self.lookups = 0
+        self.hits = 0
+        self.saved_seconds = 0.0
+
+    def _embed(self, query: str) -> np.ndarray:
+        embedding = get_embedding_model().encode_queries([query])[0]
+        return embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+
+    def _sync_version(self, kb_version: str):
+        if kb_version != self._kb_version:
+            self._kb_version = kb_version
+            self._queries, self._results, self._latencies = [], [], []
+            self._embeddings = np.empty((0, 0), dtype=np.float32)
+
+    def lookup(self, query: str):
+        """Return (result, cache_info) for a similar earlier query, or None."""
+        started = time.perf_counter()
+        embedding = self._embed(query)
+        kb_version = get_kb_version()
+
+        with self._lock:
+            self.lookups += 1
+            self._sync_version(kb_version)
+            if not self._queries:
+                return None
+
+            similarities = self._embeddings @ embedding
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                return None
+
+            lookup_seconds = time.perf_counter() - started
+            saved = max(0.0, self._latencies[best] - lookup_seconds)
+            self.hits += 1
+            self.saved_seconds += saved
+            info = {
+                "type": "semantic",
+                "similarity": round(similarity, 4),
+                "matched_query": self._queries[best],
+                "saved_seconds": round(saved, 3)
+            }
+            return self._results[best], info
+
+    def store(self, query: str, result: dict, latency_seconds: float):
+        """Remember a freshly generated result and how long it took to produce."""
+        embedding = self._embed(query)
+        kb_version = get_kb_version()
+
+        with self._lock:
+            self._sync_version(kb_version)
+            if self._queries:
+                self._embeddings = np.vstack([self._embeddings, embedding[None, :]])
+            else:
+                self._embeddings = embedding[None, :].astype(np.float32)
+            self._queries.append(query)
+            self._results.append(result)
+            self._latencies.append(latency_seconds)
+
+            # Evict the oldest entries beyond the size limit
+            overflow = len(self._queries) - self.max_entries
+            if overflow > 0:
+                self._queries = self._queries[overflow:]
+                self._results = self._results[overflow:]
+                self._latencies = self._latencies[overflow:]
+                self._embeddings = self._embeddings[overflow:]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._queries),
+                "kb_version": self._kb_version,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "threshold": self.threshold
+            }
+
+def get_semantic_cache():
+    """Get the shared semantic cache, or None when SEMANTIC_CACHE_ENABLED is false."""
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    return registry.get("semantic_cache", lambda: SemanticCache(
+        settings.SEMANTIC_CACHE_THRESHOLD, settings.SEMANTIC_CACHE_MAX_ENTRIES
+    ))
@@ -0,0 +1,122 @@
+import time
+import threading
+from backend.core.config import settings
+
+# Shared warmup instance
+_warmup = None
+
+def _warm_llm_clients():
+    from backend.core.llm_client import get_llm_client, get_async_llm_client
+    get_llm_client()
+    get_async_llm_client()
+
+def _warm_caches():
+    from backend.core.llm_cache import get_llm_cache
+    from backend.services.semantic_cache import get_semantic_cache
+    get_llm_cache()
+    get_semantic_cache()
+
+def _warm_tokenizer():
+    from backend.core.prompt_budget import get_encoding
+    get_encoding()
+
+def _warm_ui_index():
+    from backend.services.ui_index import get_ui_index
+    get_ui_index().pages()
+
+def _warm_lexical_index():
+    from backend.core.lexical_index import get_lexical_index
+    if settings.LEXICAL_INDEX_ENABLED:
+        get_lexical_index()
+
+def _warm_embedding_model():
+    from backend.core.embeddings import get_embedding_model
+    # One encode also pays the first-call costs (kernels, tokenizer) outside a request
+    get_embedding_model().encode(["warmup"])
+
+def _warm_vector_store():
+    from backend.services.kb_service import get_vector_store
+    get_vector_store().count()
+
+# Warmed in this order; the vector store reuses the already loaded embedding model
+COMPONENTS = [
+    ("llm_clients", _warm_llm_clients),
+    ("caches", _warm_caches),
+    ("tokenizer", _warm_tokenizer),
+    ("ui_index", _warm_ui_index),
+    ("lexical_index", _warm_lexical_index),
+    ("embedding_model", _warm_embedding_model),
+    ("vector_store", _warm_vector_store)
+]
+
+class Warmup:
+    """Loads the heavy components in a background thread and records how long each took.
+
+    The API accepts connections right away (/health); /ready reports ready
+    once every component has loaded, so the first real request doesn't pay
+    for model loading or the Pinecone connection.
+    """
+
+    def __init__(self, components: list = COMPONENTS):
+        self.components = components
+        self.status = {name: {"status": "pending", "seconds": None, "error": None} for name, _ in components}
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start warming in the background (no-op if already started)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        for name, warm in self.components:
+            with self._lock:
+                self.status[name]["status"] = "loading"
+            started = time.perf_counter()
+            try:
+                warm()
+                status, error = "ready", None
+                print(f"✓ Warmed {name} in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                status, error = "failed", str(e)
+                print(f"✗ Warming {name} failed: {e}")
+            with self._lock:
+                self.status[name].update(status=status, seconds=round(time.perf_counter() - started, 3), error=error)
+        with self._lock:
+            self.finished_at = time.time()
+        print(f"Warmup finished in {self.finished_at - self.started_at:.2f}s")
+
+    def report(self) -> dict:
+        with self._lock:
+            components = {name: dict(c) for name, c in self.status.items()}
+            finished_at = self.finished_at
+            started_at = self.started_at
+        return {
+            "ready": all(c["status"] == "ready" for c in components.values()),
+            "warmup_seconds": round(finished_at - started_at, 3) if finished_at else None,
+            "components": components
+        }
+
+def get_warmup() -> Warmup:
+    """Get the shared warmup tracker."""
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup()
+    return _warmup
+
+def readiness_report() -> dict:
+    """Warmup report for /ready; always ready when warmup is disabled."""
+    if not settings.STARTUP_WARMUP:
+        return {"ready": True, "warmup_seconds": None, "components": {}, "warmup": "disabled"}
+    return get_warmup().report()
+
+def start_warmup():
+    """Start background warmup unless STARTUP_WARMUP is off (components then load on first use)."""
+    if settings.STARTUP_WARMUP:
+        get_warmup().start()
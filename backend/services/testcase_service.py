@@ -1,88 +1,213 @@
 import json
+import time
+import asyncio
+import traceback
 from backend.services.rag_service import retrieve_context, build_testcase_prompt
-from backend.core.llm_client import LLMClient
+from backend.core.llm_client import get_llm_client, get_async_llm_client
+from backend.core.json_stream import JSONArrayStreamParser
+from backend.services.semantic_cache import get_semantic_cache
 
-llm = LLMClient()
+EMPTY_KB_RESULT = {
+    "testcases": [],
+    "error": "Knowledge Base is empty. Please upload documents first in the Knowledge Base tab.",
+    "empty_kb": True
+}
 
-def generate_testcases(query: str):
+# Fields every generated test case carries (see the prompt schema); used to tell them from nested arrays
+TESTCASE_KEYS = ("test_id", "scenario", "feature", "expected_result")
+
+def looks_like_testcase(item) -> bool:
+    return isinstance(item, dict) and any(key in item for key in TESTCASE_KEYS)
+
+def _log_error(e: Exception):
+    print(f"ERROR in generate_testcases: {str(e)}")
+    traceback.print_exc()
+
+    # Log to file as well
+    try:
+        with open("backend_error.log", "a") as f:
+            f.write(f"ERROR: {str(e)}\n")
+            f.write(traceback.format_exc())
+            f.write("\n" + "="*50 + "\n")
+    except:
+        pass
+
+def prepare_testcase_prompt(query: str):
+    """Retrieve context and build the prompt; returns (chunks, prompt or None, prompt token counts)."""
+    print(f"Generating test cases for query: {query}")
+    timings = []
+    chunks = retrieve_context(query, timings=timings)
+    print(f"Retrieved {len(chunks)} context chunks ({timings[0]['path']} retrieval, {timings[0]['total_ms']} ms)")
+
+    # Check if knowledge base is empty
+    if not chunks or len(chunks) == 0:
+        return chunks, None, None
+
+    prompt, prompt_tokens = build_testcase_prompt(query, chunks)
+    print(f"Prompt tokens: {prompt_tokens['total']} (budget {prompt_tokens['budget']})")
+    return chunks, prompt, prompt_tokens
+
+def parse_testcases_response(response: str, chunks: list) -> dict:
+    print(f"Received response from LLM (length: {len(response)})")
+
+    # Try to parse JSON response
     try:
-        print(f"Generating test cases for query: {query}")
-        chunks = retrieve_context(query)
-        print(f"Retrieved {len(chunks)} context chunks")
-        
-        # Check if knowledge base is empty
-        if not chunks or len(chunks) == 0:
+        parsed = json.loads(response)
+        print("Successfully parsed JSON on first attempt")
+    except json.JSONDecodeError as e:
+        print(f"JSON parse error: {e}")
+        # Attempt to clean up markdown code blocks if present
+        clean_response = response.strip()
+        if clean_response.startswith("```json"):
+            clean_response = clean_response[7:]
+            print("Removed ```json prefix")
+        elif clean_response.startswith("```"):
+            clean_response = clean_response[3:]
+            print("Removed ``` prefix")
+
+        if clean_response.endswith("```"):
+            clean_response = clean_response[:-3]
+            print("Removed ``` suffix")
+
+        try:
+            parsed = json.loads(clean_response.strip())
+            print("Successfully parsed JSON after cleaning")
+        except json.JSONDecodeError as e2:
+            print(f"JSON parse failed even after cleaning: {e2}")
+            print(f"Response preview: {response[:200]}...")
             return {
                 "testcases": [],
-                "error": "Knowledge Base is empty. Please upload documents first in the Knowledge Base tab.",
-                "empty_kb": True
+                "error": "Invalid JSON from model",
+                "raw_response": response[:500],
+                "parse_error": str(e2)
             }
-        
-        prompt = build_testcase_prompt(query, chunks)
+
+    # Ensure parsed is in the correct format
+    # LLM should return an array of test cases
+    if isinstance(parsed, list):
+        testcases = parsed
+        print(f"Parsed {len(testcases)} test cases")
+    elif isinstance(parsed, dict) and "testcases" in parsed:
+        testcases = parsed["testcases"]
+        print(f"Extracted {len(testcases)} test cases from dict")
+    else:
+        print(f"Unexpected response structure: {type(parsed)}")
+        testcases = [parsed] if parsed else []
+
+    return {
+        "testcases": testcases,
+        "raw_context": [c.text[:100] for c in chunks]  # Truncate for size
+    }
+
+def semantic_cache_lookup(query: str, use_cache: bool = True):
+    """Return a stored result for a near-identical earlier query, annotated with cache info."""
+    cache = get_semantic_cache() if use_cache else None
+    if cache is None:
+        return None
+    hit = cache.lookup(query)
+    if hit is None:
+        return None
+    result, info = hit
+    print(f"Semantic cache hit (similarity {info['similarity']}, saved ~{info['saved_seconds']}s)")
+    return {**result, "cache": info}
+
+def semantic_cache_store(query: str, result: dict, started: float):
+    cache = get_semantic_cache()
+    if cache is not None and result.get("testcases") and not result.get("error"):
+        cache.store(query, result, time.perf_counter() - started)
+
+def generate_testcases(query: str, use_cache: bool = True):
+    try:
+        started = time.perf_counter()
+        cached = semantic_cache_lookup(query, use_cache)
+        if cached is not None:
+            return cached
+
+        chunks, prompt, prompt_tokens = prepare_testcase_prompt(query)
+        if prompt is None:
+            return dict(EMPTY_KB_RESULT)
+
         print("Sending prompt to LLM...")
-        response = llm.generate(prompt)
-        print(f"Received response from LLM (length: {len(response)})")
+        response = get_llm_client().generate(prompt, use_cache=use_cache)
+        result = parse_testcases_response(response, chunks)
+        result["prompt_tokens"] = prompt_tokens
+        semantic_cache_store(query, result, started)
+        return result
+    except Exception as e:
+        _log_error(e)
+        raise e
 
-        # Try to parse JSON response
-        try:
-            parsed = json.loads(response)
-            print("Successfully parsed JSON on first attempt")
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error: {e}")
-            # Attempt to clean up markdown code blocks if present
-            clean_response = response.strip()
-            if clean_response.startswith("```json"):
-                clean_response = clean_response[7:]
-                print("Removed ```json prefix")
-            elif clean_response.startswith("```"):
-                clean_response = clean_response[3:]
-                print("Removed ``` prefix")
-            
-            if clean_response.endswith("```"):
-                clean_response = clean_response[:-3]
-                print("Removed ``` suffix")
-            
-            try:
-                parsed = json.loads(clean_response.strip())
-                print("Successfully parsed JSON after cleaning")
-            except json.JSONDecodeError as e2:
-                print(f"JSON parse failed even after cleaning: {e2}")
-                print(f"Response preview: {response[:200]}...")
-                return {
-                    "testcases": [],
-                    "error": "Invalid JSON from model",
-                    "raw_response": response[:500],
-                    "parse_error": str(e2)
-                }
-        
-        # Ensure parsed is in the correct format
-        # LLM should return an array of test cases
-        if isinstance(parsed, list):
-            testcases = parsed
-            print(f"Parsed {len(testcases)} test cases")
-        elif isinstance(parsed, dict) and "testcases" in parsed:
-            testcases = parsed["testcases"]
-            print(f"Extracted {len(testcases)} test cases from dict")
-        else:
-            print(f"Unexpected response structure: {type(parsed)}")
-            testcases = [parsed] if parsed else []
-
-        return {
-            "testcases": testcases,
-            "raw_context": [c.text[:100] for c in chunks]  # Truncate for size
-        }
+async def generate_testcases_async(query: str, use_cache: bool = True):
+    """Async variant: retrieval runs in a worker thread, the LLM call on the event loop."""
+    try:
+        started = time.perf_counter()
+        cached = await asyncio.to_thread(semantic_cache_lookup, query, use_cache)
+        if cached is not None:
+            return cached
+
+        chunks, prompt, prompt_tokens = await asyncio.to_thread(prepare_testcase_prompt, query)
+        if prompt is None:
+            return dict(EMPTY_KB_RESULT)
+
+        print("Sending prompt to LLM...")
+        response = await get_async_llm_client().generate(prompt, use_cache=use_cache)
+        result = parse_testcases_response(response, chunks)
+        result["prompt_tokens"] = prompt_tokens
+        await asyncio.to_thread(semantic_cache_store, query, result, started)
+        return result
     except Exception as e:
-        print(f"ERROR in generate_testcases: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        # Log to file as well
-        try:
-            with open("backend_error.log", "a") as f:
-                f.write(f"ERROR: {str(e)}\n")
-                f.write(traceback.format_exc())
-                f.write("\n" + "="*50 + "\n")
-        except:
-            pass
-        
+        _log_error(e)
         raise e
+
+async def stream_testcases(query: str, use_cache: bool = True):
+    """Yield (event, data) pairs while the LLM streams its answer.
+
+    Emits "context" once retrieval is done, one "testcase" per array element
+    as soon as its JSON object closes, then "done" (or "error"). A semantic
+    cache hit replays the stored test cases and reports it in "done".
+    """
+    try:
+        started = time.perf_counter()
+        cached = await asyncio.to_thread(semantic_cache_lookup, query, use_cache)
+        if cached is not None:
+            yield "context", {"raw_context": cached.get("raw_context", [])}
+            for testcase in cached["testcases"]:
+                yield "testcase", testcase
+            yield "done", {"count": len(cached["testcases"]), "cache": cached["cache"]}
+            return
+
+        chunks, prompt, prompt_tokens = await asyncio.to_thread(prepare_testcase_prompt, query)
+        if prompt is None:
+            yield "error", dict(EMPTY_KB_RESULT)
+            return
+        raw_context = [c.text[:100] for c in chunks]
+        yield "context", {"raw_context": raw_context, "prompt_tokens": prompt_tokens}
+
+        print("Streaming prompt to LLM...")
+        parser = JSONArrayStreamParser(accept=looks_like_testcase)
+        parts = []
+        testcases = []
+        async for delta in get_async_llm_client().stream(prompt, use_cache=use_cache):
+            parts.append(delta)
+            for testcase in parser.feed(delta):
+                testcases.append(testcase)
+                yield "testcase", testcase
+
+        if not testcases:
+            # Not a streamable array (e.g. a single object); fall back to a full parse
+            result = parse_testcases_response("".join(parts), chunks)
+            if result.get("error"):
+                yield "error", result
+                return
+            for testcase in result["testcases"]:
+                testcases.append(testcase)
+                yield "testcase", testcase
+
+        print(f"Streamed {len(testcases)} test cases")
+        await asyncio.to_thread(
+            semantic_cache_store, query, {"testcases": testcases, "raw_context": raw_context}, started
+        )
+        yield "done", {"count": len(testcases)}
+    except Exception as e:
+        _log_error(e)
+        yield "error", {"testcases": [], "error": str(e)}
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import threading
+from backend.core.models import UIElement
+from backend.core.registry import registry
+from backend.parsers.html_parser import parse_html
+from backend.services.kb_service import file_hash, HTML_DIR, HTML_PATH
+
+# How often (seconds) lookups re-check the HTML directory for changed files
+RECHECK_SECONDS = 5.0
+# Page used when a request doesn't name one
+DEFAULT_PAGE = "checkout.html"
+
+class PageElements:
+    """Parsed UI elements of one HTML page with lookup tables."""
+
+    def __init__(self, page: str, mtime_ns: int, size: int, content_hash: str, elements: list[UIElement]):
+        self.page = page
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.hash = content_hash
+        self.elements = elements
+        self.by_id = {e.html_id: e for e in elements if e.html_id}
+        self.by_name = {}
+        self.by_tag = {}
+        for e in elements:
+            if e.name:
+                self.by_name.setdefault(e.name, []).append(e)
+            self.by_tag.setdefault(e.tag, []).append(e)
+
+class UIElementIndex:
+    """In-memory UI element index keyed by page (HTML file name).
+
+    Pages are re-parsed only when their mtime/size change and their content
+    hash differs from the persisted index, so lookups normally do no disk
+    I/O at all; the directory is re-checked at most every RECHECK_SECONDS
+    or right after `invalidate`.
+    """
+
+    def __init__(self, html_dir: str = HTML_DIR, index_path: str = HTML_PATH):
+        self.html_dir = html_dir
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._checked_at = 0.0
+        self._stale = True
+
+    def invalidate(self):
+        """Force a re-check on the next lookup (after an upload, build or reset)."""
+        self._stale = True
+
+    def _load_persisted(self) -> dict:
+        """Persisted elements by page: {page: {"hash": ..., "elements": [...]}}."""
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: could not read UI element index: {e}")
+            return {}
+        # Older builds wrote a flat list for a single unnamed page; re-parse in that case
+        return data.get("pages", {}) if isinstance(data, dict) else {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "pages": {
+                    page: {"hash": entry.hash, "elements": [e.dict() for e in entry.elements]}
+                    for page, entry in self._pages.items()
+                }
+            }, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _refresh(self):
+        """Bring the index in line with the HTML files on disk; caller holds the lock."""
+        now = time.monotonic()
+        if not self._stale and now - self._checked_at < RECHECK_SECONDS:
+            return
+        self._stale = False
+        self._checked_at = now
+
+        files = []
+        if os.path.exists(self.html_dir):
+            files = [f for f in os.listdir(self.html_dir) if f.endswith(".html") or f.endswith(".htm")]
+
+        persisted = None
+        changed = set(self._pages) - set(files)
+        pages = {}
+        for page in files:
+            path = os.path.join(self.html_dir, page)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = self._pages.get(page)
+            if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+                pages[page] = entry
+                continue
+
+            content_hash = file_hash(path)
+            if entry is not None and entry.hash == content_hash:
+                elements = entry.elements
+            else:
+                if persisted is None:
+                    persisted = self._load_persisted()
+                saved = persisted.get(page)
+                if saved is not None and saved.get("hash") == content_hash:
+                    elements = [UIElement(**e) for e in saved["elements"]]
+                else:
+                    elements = parse_html(path)
+                    print(f"✓ Indexed {len(elements)} UI elements for {page}")
+                    changed.add(page)
+            pages[page] = PageElements(page, stat.st_mtime_ns, stat.st_size, content_hash, elements)
+
+        self._pages = pages
+        if changed or (persisted is not None and set(persisted) != set(pages)):
+            self._save()
+
+    def page_entry(self, page: str = None):
+        """Indexed elements of `page` (default page when None), or None if it isn't indexed."""
+        with self._lock:
+            self._refresh()
+            if page is None:
+                page = DEFAULT_PAGE if DEFAULT_PAGE in self._pages else next(iter(sorted(self._pages)), None)
+            return self._pages.get(page)
+
+    def pages(self) -> dict:
+        """Indexed pages and their element counts."""
+        with self._lock:
+            self._refresh()
+            return {page: len(entry.elements) for page, entry in sorted(self._pages.items())}
+
+    def resolve_page(self, page: str = None):
+        """Name of the page a lookup for `page` will use (the default page when None)."""
+        entry = self.page_entry(page)
+        return entry.page if entry is not None else None
+
+    def elements(self, page: str = None) -> list[UIElement]:
+        entry = self.page_entry(page)
+        return entry.elements if entry is not None else []
+
+    def find(self, page: str = None, tag: str = None, html_id: str = None, name: str = None) -> list[UIElement]:
+        """Elements of a page matching every given criterion."""
+        entry = self.page_entry(page)
+        if entry is None:
+            return []
+        if html_id is not None:
+            candidates = [entry.by_id[html_id]] if html_id in entry.by_id else []
+        elif name is not None:
+            candidates = entry.by_name.get(name, [])
+        elif tag is not None:
+            candidates = entry.by_tag.get(tag, [])
+        else:
+            candidates = entry.elements
+        return [
+            e for e in candidates
+            if (tag is None or e.tag == tag) and (name is None or e.name == name)
+        ]
+
+    def index_page(self, file_path: str) -> list[UIElement]:
+        """(Re)index one page right away and return its elements."""
+        self.invalidate()
+        return self.elements(os.path.basename(file_path))
+
+    def clear(self):
+        with self._lock:
+            self._pages = {}
+            self._stale = True
+
+def get_ui_index() -> UIElementIndex:
+    """Get the shared UI element index."""
+    return registry.get("ui_index", UIElementIndex)
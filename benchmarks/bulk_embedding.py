@@ -0,0 +1,66 @@
+"""Throughput of bulk embedding across worker process counts.
+
+Embeds the same knowledge-base-sized chunks in-process and with the
+BulkEmbedder pool at 1, 2, 4, ... workers (up to the core count), with the
+embedding cache off:
+
+    python benchmarks/bulk_embedding.py --chunks 4096
+"""
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+
+from backend.core.embeddings import EmbeddingModel
+from backend.core.bulk_embeddings import BulkEmbedder
+from backend.parsers.text_chunker import chunk_text
+
+BATCH_SIZE = 256  # Same as the build pipeline's default INGEST_BATCH_SIZE
+
+def sample_chunks(count: int) -> list[str]:
+    chunks = []
+    assets = os.path.join(ROOT, "test_assets")
+    for name in sorted(os.listdir(assets)):
+        with open(os.path.join(assets, name), "r", encoding="utf-8", errors="ignore") as f:
+            chunks.extend(c.text for c in chunk_text(name, f.read()))
+    return [f"{chunks[i % len(chunks)]} [{i}]" for i in range(count)]
+
+def throughput(encode, texts: list[str]) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(texts), BATCH_SIZE):
+        encode(texts[i:i + BATCH_SIZE])
+    return len(texts) / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=4096)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    texts = sample_chunks(args.chunks)
+    model = EmbeddingModel()
+    model.encode(texts[:32])  # Warm-up
+    rows = [("in-process", 1, throughput(model.encode, texts))]
+
+    workers = 1
+    while workers <= args.max_workers:
+        bulk = BulkEmbedder(model, workers)
+        try:
+            rows.append(("bulk", workers, throughput(bulk.encode, texts)))
+        finally:
+            bulk.close()
+        workers *= 2
+
+    base = rows[1][2]
+    print(f"\n{args.chunks} chunks, {os.cpu_count()} CPUs, batches of {BATCH_SIZE}\n")
+    print(f"{'mode':<11} {'workers':>7} {'chunks/s':>9} {'speedup':>8} {'efficiency':>11}")
+    for mode, n, rate in rows:
+        speedup = rate / base
+        print(f"{mode:<11} {n:>7} {rate:>9.1f} {speedup:>7.2f}x {speedup / n:>10.0%}")
+
+if __name__ == "__main__":
+    main()
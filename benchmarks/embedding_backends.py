@@ -0,0 +1,111 @@
+"""Compare embedding backends: load time, throughput, peak RSS and agreement with PyTorch.
+
+Each backend runs in its own process so memory numbers aren't mixed up:
+
+    python benchmarks/embedding_backends.py                      # torch, onnx fp32, onnx int8
+    python benchmarks/embedding_backends.py --texts 2048 --backends torch onnx-int8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.core.config import settings
+from backend.core.onnx_embeddings import OnnxEncoder, FP32_MIN_COSINE, INT8_MIN_COSINE
+from backend.parsers.text_chunker import chunk_text
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+BACKENDS = ["torch", "onnx-fp32", "onnx-int8"]
+
+def sample_texts(count: int) -> list[str]:
+    """Knowledge-base-sized chunks of the test assets, repeated up to `count`."""
+    chunks = []
+    assets = os.path.join(ROOT, "test_assets")
+    for name in sorted(os.listdir(assets)):
+        with open(os.path.join(assets, name), "r", encoding="utf-8", errors="ignore") as f:
+            chunks.extend(c.text for c in chunk_text(name, f.read()))
+    return [chunks[i % len(chunks)] for i in range(count)]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def run_backend(backend: str, count: int, output_path: str):
+    """Child process: load one backend, embed the sample texts, report numbers as JSON."""
+    texts = sample_texts(count)
+    baseline_rss = peak_rss_mb()
+    started = time.perf_counter()
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(MODEL_NAME)
+    else:
+        model = OnnxEncoder(MODEL_NAME, settings.EMBEDDING_ONNX_DIR, quantize=backend == "onnx-int8",
+                            threads=settings.EMBEDDING_ONNX_THREADS)
+    load_seconds = time.perf_counter() - started
+    loaded_rss = peak_rss_mb()
+
+    model.encode(texts[:32], show_progress_bar=False)  # Warm-up
+    started = time.perf_counter()
+    embeddings = np.asarray(model.encode(texts, show_progress_bar=False), dtype=np.float32)
+    encode_seconds = time.perf_counter() - started
+    np.save(output_path, embeddings)
+
+    print(json.dumps({
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "texts_per_second": round(len(texts) / encode_seconds, 1),
+        "rss_after_load_mb": round(loaded_rss - baseline_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=1024, help="Number of chunks to embed")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_backend(args.worker, args.texts, args.output)
+        return
+
+    results, vectors = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            output = os.path.join(tmp, f"{backend}.npy")
+            proc = subprocess.run(
+                [sys.executable, __file__, "--worker", backend, "--texts", str(args.texts), "--output", output],
+                capture_output=True, text=True, cwd=ROOT
+            )
+            if proc.returncode != 0:
+                print(f"✗ {backend} failed:\n{proc.stderr}")
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            vectors[backend] = np.load(output)
+
+    print(f"\n{args.texts} chunks, {os.cpu_count()} CPUs\n")
+    print(f"{'backend':<10} {'load s':>7} {'texts/s':>9} {'model RSS MB':>13} {'peak RSS MB':>12} {'min cosine':>11}")
+    for r in results:
+        cosine = "-"
+        reference = vectors.get("torch")
+        if reference is not None and r["backend"] != "torch":
+            # Both sides are L2-normalized, so the row-wise dot product is the cosine similarity
+            sims = np.sum(reference * vectors[r["backend"]], axis=1)
+            tolerance = INT8_MIN_COSINE if r["backend"] == "onnx-int8" else FP32_MIN_COSINE
+            status = "ok" if sims.min() >= tolerance else f"BELOW {tolerance}"
+            cosine = f"{sims.min():.5f} {status}"
+        print(f"{r['backend']:<10} {r['load_seconds']:>7} {r['texts_per_second']:>9} "
+              f"{r['rss_after_load_mb']:>13} {r['peak_rss_mb']:>12} {cosine:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Memory and throughput of per-worker embedding models vs one shared embedding server.
+
+Starts W worker processes (like `uvicorn --workers W`). Each fires query
+embedding requests from several threads, either against its own in-process
+model or through the shared server:
+
+    python benchmarks/embedding_server.py --workers 4 --threads 4 --requests 200
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import resource
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.parsers.text_chunker import chunk_text
+
+def sample_queries(count: int, worker: int) -> list[str]:
+    """Query-sized snippets of the test assets."""
+    snippets = []
+    assets = os.path.join(ROOT, "test_assets")
+    for name in sorted(os.listdir(assets)):
+        with open(os.path.join(assets, name), "r", encoding="utf-8", errors="ignore") as f:
+            snippets.extend(c.text for c in chunk_text(name, f.read(), chunk_size=160, overlap=0))
+    return [f"{snippets[i % len(snippets)]} ({worker}-{i})" for i in range(count)]
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def run_worker(worker: int, threads: int, requests: int):
+    """Child process: load the model (or connect), wait for "go" on stdin, then fire requests."""
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.core.embeddings import get_embedding_model
+
+    started = time.perf_counter()
+    model = get_embedding_model()
+    load_seconds = time.perf_counter() - started
+    queries = sample_queries(requests, worker)
+    print("ready", flush=True)
+    sys.stdin.readline()
+
+    latencies = []
+    def one(query):
+        t = time.perf_counter()
+        model.encode_queries([query])
+        latencies.append(time.perf_counter() - t)
+
+    begin = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, queries))
+    end = time.time()
+    latencies.sort()
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "begin": begin,
+        "end": end,
+        "requests": len(queries),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "peak_rss_mb": peak_rss_mb()
+    }), flush=True)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def run_setup(name: str, args, env: dict) -> dict:
+    workers = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--worker", str(i), "--threads", str(args.threads),
+             "--requests", str(args.requests)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=ROOT, env=env
+        )
+        for i in range(args.workers)
+    ]
+    for proc in workers:
+        line = proc.stdout.readline().strip()
+        if line != "ready":
+            raise RuntimeError(f"{name}: worker failed to start")
+    for proc in workers:
+        proc.stdin.write("go\n")
+        proc.stdin.flush()
+    results = [json.loads(proc.communicate()[0].strip().splitlines()[-1]) for proc in workers]
+
+    wall = max(r["end"] for r in results) - min(r["begin"] for r in results)
+    total = sum(r["requests"] for r in results)
+    return {
+        "setup": name,
+        "load_seconds": round(max(r["load_seconds"] for r in results), 2),
+        "requests_per_second": round(total / wall, 1),
+        "p50_ms": round(sorted(r["p50_ms"] for r in results)[len(results) // 2], 1),
+        "p95_ms": round(max(r["p95_ms"] for r in results), 1),
+        "workers_rss_mb": round(sum(r["peak_rss_mb"] for r in results), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Simulated API worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent requests per worker")
+    parser.add_argument("--requests", type=int, default=200, help="Query embeddings per worker")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args.worker, args.threads, args.requests)
+        return
+
+    # Measure encoding, not cache hits
+    base_env = {**os.environ, "EMBEDDING_CACHE_ENABLED": "false", "STARTUP_WARMUP": "false"}
+    results = [run_setup("per-worker", args, {**base_env, "EMBEDDING_SERVER_ADDRESS": ""})]
+
+    address = f"127.0.0.1:{free_port()}"
+    server_env = {**base_env, "EMBEDDING_SERVER_ADDRESS": address}
+    server = subprocess.Popen([sys.executable, "-m", "backend.core.embedding_server"], cwd=ROOT, env=server_env,
+                              stdout=subprocess.DEVNULL)
+    try:
+        from backend.core.embedding_server import RemoteEmbeddingModel
+        deadline = time.time() + 300
+        while True:
+            try:
+                client = RemoteEmbeddingModel(address)
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise RuntimeError("Embedding server did not start")
+                time.sleep(0.5)
+        shared = run_setup("shared", args, {**server_env, "EMBEDDING_SERVER_FALLBACK": "false"})
+        info = client.info()
+        shared["server_rss_mb"] = round(info["peak_rss_mb"] or 0, 1)
+        shared["requests_per_batch"] = (info["batches"] or {}).get("requests_per_batch")
+        results.append(shared)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"\n{args.workers} workers x {args.threads} threads x {args.requests} queries, {os.cpu_count()} CPUs\n")
+    print(f"{'setup':<11} {'load s':>7} {'req/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'total RSS MB':>13} {'req/batch':>10}")
+    for r in results:
+        total_rss = r["workers_rss_mb"] + r.get("server_rss_mb", 0)
+        print(f"{r['setup']:<11} {r['load_seconds']:>7} {r['requests_per_second']:>8} {r['p50_ms']:>7} "
+              f"{r['p95_ms']:>7} {round(total_rss, 1):>13} {r.get('requests_per_batch') or '-':>10}")
+
+if __name__ == "__main__":
+    main()
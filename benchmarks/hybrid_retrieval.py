@@ -0,0 +1,84 @@
+"""Per-query latency of dense, hybrid and auto (lexical fast path) retrieval.
+
+By default indexes the test assets into a throwaway local vector store and
+lexical index; --configured queries the knowledge base as configured in
+.env instead (e.g. Pinecone, built beforehand), which adds the network to
+the dense path:
+
+    python benchmarks/hybrid_retrieval.py --repeat 20
+    python benchmarks/hybrid_retrieval.py --configured --query "SAVE15"
+"""
+import os
+import sys
+import argparse
+import statistics
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_QUERIES = [
+    "SAVE15",
+    "discount code",
+    "email validation",
+    "What happens when the user applies an expired discount code at checkout?",
+    "Which shipping options are available and how do they change the total price?"
+]
+STEPS = ("lexical_ms", "embed_ms", "dense_ms", "fuse_ms", "total_ms")
+
+def build_sample_index():
+    """Index the test assets into the (temporary) local store and lexical index."""
+    from backend.parsers.text_chunker import chunk_text
+    from backend.services.kb_service import get_vector_store, document_id
+
+    vs = get_vector_store()
+    assets = os.path.join(ROOT, "test_assets")
+    for name in sorted(os.listdir(assets)):
+        with open(os.path.join(assets, name), "r", encoding="utf-8", errors="ignore") as f:
+            chunks = chunk_text(document_id(name), f.read())
+        for chunk in chunks:
+            chunk.metadata["source"] = name
+        vs.add_chunks(chunks)
+    vs.flush()
+    print(f"Indexed {vs.count()} chunks from {assets}")
+
+def median(values: list) -> str:
+    values = [v for v in values if v is not None]
+    return f"{statistics.median(values):.2f}" if values else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", action="append", help="Query to time (repeatable); defaults to a mixed set")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--configured", action="store_true", help="Use the configured, already built knowledge base")
+    args = parser.parse_args()
+
+    if not args.configured:
+        data_dir = tempfile.mkdtemp(prefix="qa-agent-retrieval-")
+        os.environ["VECTOR_STORE_BACKEND"] = "local"
+        os.environ["LOCAL_VECTOR_STORE_DIR"] = os.path.join(data_dir, "vectors")
+        os.environ["LEXICAL_INDEX_PATH"] = os.path.join(data_dir, "lexical_index.json")
+        os.environ["LEXICAL_INDEX_ENABLED"] = "true"
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"  # Time the model, not cache hits
+
+    from backend.services.rag_service import retrieve_context, RETRIEVAL_MODES
+    if not args.configured:
+        build_sample_index()
+    queries = args.query or DEFAULT_QUERIES
+    retrieve_context("warmup", args.top_k, mode="hybrid")
+
+    print(f"\nMedian latency over {args.repeat} runs (ms)\n")
+    print(f"{'mode':<7} {'path':<8} " + " ".join(f"{s[:-3]:>8}" for s in STEPS) + "  query")
+    for query in queries:
+        for mode in RETRIEVAL_MODES:
+            timings = []
+            for _ in range(args.repeat):
+                retrieve_context(query, args.top_k, mode=mode, timings=timings)
+            path = timings[0]["path"]
+            cells = " ".join(f"{median([t[s] for t in timings]):>8}" for s in STEPS)
+            print(f"{mode:<7} {path:<8} {cells}  {query[:50]}")
+        print()
+
+if __name__ == "__main__":
+    main()
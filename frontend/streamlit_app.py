@@ -2,6 +2,8 @@ import streamlit as st
 import requests
 import pandas as pd
 import os
+import json
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -186,16 +188,31 @@ if menu == "Knowledge Base":
                 help="Supported formats: .txt, .md, .pdf, .json"
             )
 
+            ingest_now = st.checkbox(
+                "Embed right after upload", value=False, key="docs_ingest_now",
+                help="Start a Knowledge Base build for the new files as soon as they are uploaded"
+            )
+
             if st.button("📤 Upload Documents", key="btn_upload_docs", type="primary"):
                 if docs:
                     with st.spinner("Uploading documents..."):
-                        for f in docs:
-                            requests.post(
-                                f"{BACKEND_URL}/kb/docs/upload",
-                                files={"file": (f.name, f.read(), f.type)}
-                            )
-                    st.success(f"✅ Uploaded {len(docs)} document(s)")
-                    st.rerun()
+                        # One multipart request; the uploaded files are streamed, not read into memory
+                        resp = requests.post(
+                            f"{BACKEND_URL}/kb/docs/upload",
+                            params={"ingest": str(ingest_now).lower()},
+                            files=[("files", (f.name, f, f.type)) for f in docs]
+                        )
+                    if resp.status_code == 200:
+                        data = resp.json()
+                        for r in data["files"]:
+                            if r.get("error"):
+                                st.warning(f"⚠️ {r['filename']}: {r['error']}")
+                        if data.get("ingest_job"):
+                            st.session_state["build_job_id"] = data["ingest_job"]["job_id"]
+                        st.success(f"✅ {data['message']}")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ Upload failed: {resp.json().get('detail', resp.status_code)}")
                 else:
                     st.warning("Please select files first")
 
@@ -214,13 +231,16 @@ if menu == "Knowledge Base":
             if st.button("📤 Upload HTML", key="btn_upload_html", type="primary"):
                 if html_file:
                     with st.spinner("Uploading HTML..."):
-                        requests.post(
+                        resp = requests.post(
                             f"{BACKEND_URL}/kb/html/upload",
-                            files={"file": (html_file.name, html_file.read(), html_file.type)}
+                            files={"file": (html_file.name, html_file, html_file.type)}
                         )
 
-                    st.success("✅ HTML uploaded successfully")
-                    st.rerun()
+                    if resp.status_code == 200:
+                        st.success("✅ HTML uploaded successfully")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ Upload failed: {resp.json().get('detail', resp.status_code)}")
                 else:
                     st.warning("Please select an HTML file first")
 
@@ -263,26 +283,85 @@ if menu == "Knowledge Base":
     
     with col1:
         if st.button("🔨 Build Knowledge Base", type="primary", key="btn_build_kb", width="stretch"):
-            with st.spinner("Building Knowledge Base..."):
-                resp = requests.get(f"{BACKEND_URL}/kb/build")
-                if resp.status_code == 200:
-                    st.success("✅ Knowledge Base built successfully!")
-                else:
-                    st.error("❌ Failed to build Knowledge Base")
+            resp = requests.post(f"{BACKEND_URL}/kb/build")
+            data = resp.json() if resp.headers.get("content-type", "").startswith("application/json") else {}
+            if data.get("job_id"):
+                # 202 for a new build, 409 when one is already running; follow either
+                st.session_state["build_job_id"] = data["job_id"]
+                if resp.status_code == 409:
+                    st.info("A build is already running, showing its progress")
+            else:
+                st.error(f"❌ Failed to start Knowledge Base build: {data.get('detail', resp.status_code)}")
     
     with col2:
         if st.button("🗑️ Reset Knowledge Base", type="secondary", key="btn_reset_kb", width="stretch"):
             if st.session_state.get("confirm_reset"):
                 with st.spinner("Resetting..."):
-                    requests.post(f"{BACKEND_URL}/kb/reset")
+                    resp = requests.post(f"{BACKEND_URL}/kb/reset")
+                    st.session_state["confirm_reset"] = False
+                if resp.status_code == 409:
+                    st.error("❌ Cannot reset while a build is running")
+                else:
                     st.session_state["full_testcases"] = {}
                     st.session_state["selected_test"] = None
-                    st.session_state["confirm_reset"] = False
-                st.success("✅ Knowledge Base reset successfully")
-                st.rerun()
+                    st.success("✅ Knowledge Base reset successfully")
+                    st.rerun()
             else:
                 st.session_state["confirm_reset"] = True
                 st.warning("⚠️ Click Reset again to confirm")
+    
+    # Build progress: poll the background job instead of holding a request open
+    job_id = st.session_state.get("build_job_id")
+    if job_id:
+        st.markdown("**🔨 Build Progress**")
+        cancel_slot = st.empty()
+        if cancel_slot.button("⏹️ Cancel Build", key="btn_cancel_build"):
+            requests.post(f"{BACKEND_URL}/kb/jobs/{job_id}/cancel")
+        progress_bar = st.progress(0.0)
+        progress_text = st.empty()
+        
+        job = None
+        while True:
+            try:
+                resp = requests.get(f"{BACKEND_URL}/kb/jobs/{job_id}", timeout=5)
+            except requests.RequestException as e:
+                st.error(f"Could not reach backend: {e}")
+                break
+            if resp.status_code != 200:
+                st.error("Build job not found (the backend may have restarted)")
+                st.session_state["build_job_id"] = None
+                break
+            job = resp.json()
+            p = job["progress"]
+            files_total = p.get("files_total", 0)
+            files_done = p.get("files_done", 0)
+            if files_done:
+                expected_chunks = p.get("chunks_queued", 0) * files_total / files_done
+                fraction = 0.5 * files_done / files_total + 0.5 * p.get("chunks_upserted", 0) / max(expected_chunks, 1)
+            else:
+                fraction = 0.0
+            if job["status"] != "running":
+                fraction = 1.0
+            progress_bar.progress(min(fraction, 1.0))
+            eta = f", ETA {p['eta_seconds']:.0f}s" if p.get("eta_seconds") is not None else ""
+            progress_text.caption(
+                f"{job['status'].capitalize()} · files {files_done}/{files_total} · "
+                f"chunks embedded {p.get('chunks_embedded', 0)}, upserted {p.get('chunks_upserted', 0)} · "
+                f"{p.get('chunks_per_second', 0)} chunks/s{eta}"
+            )
+            if job["status"] not in ("queued", "running"):
+                break
+            time.sleep(1)
+        
+        cancel_slot.empty()
+        if job is not None and job["status"] not in ("queued", "running"):
+            st.session_state["build_job_id"] = None
+            if job["status"] == "completed":
+                st.success(f"✅ Knowledge Base built successfully in {job['elapsed_seconds']}s!")
+            elif job["status"] == "cancelled":
+                st.warning("⚠️ Build cancelled; finished documents were kept")
+            else:
+                st.error(f"❌ Failed to build Knowledge Base: {job.get('error')}")
 
 # ==========================================================
 # --------------------- TEST CASES -------------------------
@@ -307,32 +386,50 @@ elif menu == "Test Cases":
             )
             manual_gen = st.button("🔍 Generate from Query", key="btn_manual_gen", width="stretch")
         
+        use_cache = st.checkbox("Reuse cached results for identical requests", value=True, key="tc_use_cache")
+        
         if auto_gen or (manual_gen and manual_query):
             query = manual_query if manual_gen and manual_query else "Generate comprehensive positive and negative test cases for the entire application described in the documentation."
             
-            with st.spinner("🤖 Generating test cases... This may take a moment."):
-                try:
-                    resp = requests.post(
-                        f"{BACKEND_URL}/agent/testcases",
-                        json={"query": query}
-                    )
-                    
+            status_box = st.empty()
+            live_list = st.container()
+            status_box.info("🤖 Generating test cases... they will appear here as soon as each one is ready.")
+            streamed = {}
+            try:
+                with requests.post(
+                    f"{BACKEND_URL}/agent/testcases/stream",
+                    json={"query": query, "use_cache": use_cache},
+                    stream=True
+                ) as resp:
                     if resp.status_code == 200:
-                        data = resp.json()
-                        
-                        # Check if there's an error message (e.g., empty KB)
-                        if data.get("error"):
-                            st.error(f"❌ {data['error']}")
-                            if data.get("empty_kb"):
-                                st.info("💡 **Tip:** Go to the **Knowledge Base** tab and upload documents, then click **Build Knowledge Base**.")
-                        elif isinstance(data.get("testcases"), list):
-                            st.session_state["full_testcases"] = {tc["test_id"]: tc for tc in data["testcases"]}
-                            st.success(f"✅ Generated {len(data['testcases'])} test cases successfully!")
-                            st.rerun()
-                        else:
-                            st.error("❌ Model returned invalid JSON structure")
-                            st.write(data)
+                        event = None
+                        for line in resp.iter_lines(decode_unicode=True):
+                            # Server-sent events: "event: <name>" then "data: <json>"
+                            if line.startswith("event:"):
+                                event = line[len("event:"):].strip()
+                                continue
+                            if not line.startswith("data:"):
+                                continue
+                            data = json.loads(line[len("data:"):].strip())
+                            
+                            if event == "testcase":
+                                test_id = data.get("test_id") or f"TC-{len(streamed) + 1:03d}"
+                                streamed[test_id] = data
+                                live_list.markdown(f"✅ **{test_id}**: {data.get('scenario', 'No scenario')}")
+                                status_box.info(f"🤖 Received {len(streamed)} test case(s) so far...")
+                            elif event == "error":
+                                status_box.empty()
+                                st.error(f"❌ {data.get('error')}")
+                                if data.get("empty_kb"):
+                                    st.info("💡 **Tip:** Go to the **Knowledge Base** tab and upload documents, then click **Build Knowledge Base**.")
+                                if data.get("raw_response"):
+                                    st.write(data)
+                            elif event == "done":
+                                status_box.empty()
+                                # Shown after the rerun below
+                                st.session_state["tc_cache_notice"] = data.get("cache")
                     else:
+                        status_box.empty()
                         st.error(f"❌ Backend Error ({resp.status_code})")
                         try:
                             error_data = resp.json()
@@ -340,12 +437,25 @@ elif menu == "Test Cases":
                                 st.error(error_data["detail"])
                         except:
                             st.text(resp.text)
-                except Exception as e:
-                    st.error(f"❌ Request Failed: {e}")
+            except Exception as e:
+                st.error(f"❌ Request Failed: {e}")
+            
+            if streamed:
+                st.session_state["full_testcases"] = streamed
+                st.success(f"✅ Generated {len(streamed)} test cases successfully!")
+                st.rerun()
     
     st.markdown("---")
     
     # Display test cases
+    cache_notice = st.session_state.pop("tc_cache_notice", None)
+    if cache_notice:
+        st.info(
+            f"⚡ Reused results of a similar earlier request "
+            f"(\"{cache_notice['matched_query']}\", similarity {cache_notice['similarity']}), "
+            f"saving ~{cache_notice['saved_seconds']}s"
+        )
+    
     if st.session_state["full_testcases"]:
         st.subheader(f"📋 Test Cases ({len(st.session_state['full_testcases'])})")
         
@@ -458,8 +568,9 @@ elif menu == "Selenium Scripts":
         with st.spinner("🤖 Generating Selenium script... This may take a moment."):
             response = requests.post(
                 f"{BACKEND_URL}/agent/selenium-script",
-                json={"testcase": tc}
+                json={"testcase": tc, "use_cache": not st.session_state.get("bypass_script_cache", False)}
             )
+            st.session_state["bypass_script_cache"] = False
             
             if response.status_code == 200:
                 script = response.json()["script"]
@@ -498,17 +609,72 @@ elif menu == "Selenium Scripts":
         with col2:
             if st.button("🔄 Regenerate", key="btn_regenerate", width="stretch"):
                 st.session_state["generated_script"] = None
+                # Ask the backend for a fresh completion rather than the cached one
+                st.session_state["bypass_script_cache"] = True
                 st.rerun()
 
+    st.markdown("---")
+    
+    # Bulk generation for every test case, streamed back as each script completes
+    st.subheader("📦 Generate Scripts for All Test Cases")
+    if st.button("🚀 Generate All Scripts", key="btn_gen_all_selenium", width="stretch"):
+        all_testcases = list(st.session_state["full_testcases"].values())
+        progress = st.progress(0.0, text=f"Generating 0/{len(all_testcases)} scripts...")
+        generated = {}
+        failed = []
+        try:
+            with requests.post(
+                f"{BACKEND_URL}/agent/selenium-scripts/batch",
+                json={"testcases": all_testcases},
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    st.error("❌ Failed to generate scripts. Check backend logs.")
+                    st.text(response.text)
+                else:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        result = json.loads(line)
+                        if result.get("error"):
+                            failed.append(result.get("test_id"))
+                        else:
+                            generated[result["test_id"]] = result["script"]
+                        done = len(generated) + len(failed)
+                        progress.progress(done / len(all_testcases), text=f"Generated {done}/{len(all_testcases)} scripts...")
+        except Exception as e:
+            st.error(f"❌ Request Failed: {e}")
+        
+        st.session_state["generated_scripts"] = generated
+        if failed:
+            st.warning(f"⚠️ Failed to generate scripts for: {', '.join(str(t) for t in failed)}")
+        if generated:
+            st.success(f"✅ Generated {len(generated)} scripts")
+    
+    if st.session_state.get("generated_scripts"):
+        for test_id, bulk_script in st.session_state["generated_scripts"].items():
+            with st.expander(f"📝 {test_id}"):
+                st.code(bulk_script, language="python")
+                st.download_button(
+                    label="💾 Download Script",
+                    data=bulk_script,
+                    file_name=f"{test_id}.py",
+                    mime="text/plain",
+                    key=f"download_bulk_{test_id}",
+                    width="stretch"
+                )
+
 # ---------------------- FOOTER ----------------------
 st.markdown("---")
 
 # Backend health check
 try:
     response = requests.get(f"{BACKEND_URL}/health", timeout=2)
-    if response.status_code == 200:
+    if response.status_code != 200:
+        st.caption("🟡 Backend reachable but not healthy")
+    elif requests.get(f"{BACKEND_URL}/ready", timeout=2).status_code == 200:
         st.caption("🟢 Backend Connected")
     else:
-        st.caption("🟡 Backend reachable but not healthy")
+        st.caption("🟡 Backend Connected, still loading models (first requests may be slow)")
 except Exception:
     st.caption("🔴 Backend not reachable")